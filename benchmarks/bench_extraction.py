@@ -0,0 +1,236 @@
+"""Measure the throughput of NPV extraction for each model and parse batch size.
+
+A fixed random sample of lines, drawn with `--seed`, is taken from the input
+file and run through `process_corpus` once per model and batch size. Batches
+are sized in characters (`NATSUME_BATCH_CHARS`, see `max_batch_chars`); "auto"
+uses the size chosen from the available memory. Each run
+happens in a fresh process, so that the peak RSS is that of one model and one
+run, and is preceded by a short warm-up on other lines.
+
+The run is recorded with `natsume_simple.instrumentation`, which times the
+parse and match stages and each spaCy pipeline component. `normalize_verb_span`
+is wrapped with a timer, and the time of `npv_matcher` excludes its calls.
+
+The results are written as JSON, together with the commit and the versions
+they were measured with, so that runs can be compared across commits.
+
+Usage:
+    python benchmarks/bench_extraction.py --input-file data/ted_corpus.txt \\
+        --output extraction.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import spacy  # type: ignore
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mib() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / (1 << 10)
+
+
+def timed(f: Callable[..., Any], totals: Dict[str, float], name: str) -> Callable:
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            totals[name] += time.perf_counter() - start
+
+    return wrapper
+
+
+def batch_chars_arg(value: str) -> Optional[int]:
+    return None if value == "auto" else int(value)
+
+
+def run(
+    model_name: str, batch_chars: Optional[int], lines: List[str], warmup: List[str]
+) -> Dict[str, Any]:
+    if batch_chars is not None:
+        os.environ["NATSUME_BATCH_CHARS"] = str(batch_chars)
+    from natsume_simple import instrumentation, pattern_extraction
+
+    start = time.perf_counter()
+    nlp, suru_token = pattern_extraction.load_nlp_model(model_name)
+    load_seconds = time.perf_counter() - start
+    pattern_extraction.process_corpus(warmup, nlp, suru_token)
+
+    totals = {"normalize_verb_span": 0.0}
+    normalize_verb_span = pattern_extraction.normalize_verb_span
+    pattern_extraction.normalize_verb_span = timed(
+        normalize_verb_span, totals, "normalize_verb_span"
+    )
+    recorded = instrumentation.Instrumentation()
+    try:
+        with instrumentation.recording(recorded):
+            start = time.perf_counter()
+            matches = pattern_extraction.process_corpus(lines, nlp, suru_token)
+            seconds = time.perf_counter() - start
+    finally:
+        pattern_extraction.normalize_verb_span = normalize_verb_span
+
+    parse_seconds = recorded.stages["parse"]
+    matcher_seconds = recorded.stages["match"] - totals["normalize_verb_span"]
+    return {
+        "model": model_name,
+        "model_version": nlp.meta.get("version"),
+        "batch_chars": pattern_extraction.max_batch_chars(),
+        "sentences": len(lines),
+        "matches": len(matches),
+        "load_seconds": round(load_seconds, 3),
+        "seconds": round(seconds, 3),
+        "sentences_per_second": round(len(lines) / seconds, 2),
+        "matches_per_second": round(len(matches) / seconds, 2),
+        "peak_rss_mib": round(peak_rss_mib(), 1),
+        "time_share": {
+            "spacy": round(parse_seconds / seconds, 4),
+            "npv_matcher": round(matcher_seconds / seconds, 4),
+            "normalize_verb_span": round(totals["normalize_verb_span"] / seconds, 4),
+        },
+        "component_time_share": {
+            name: round(component_seconds / seconds, 4)
+            for name, component_seconds in recorded.components.items()
+        },
+    }
+
+
+def main(
+    input_file: Path,
+    output_file: Optional[Path],
+    models: List[str],
+    batch_chars_list: List[Optional[int]],
+    sample_size: int,
+    n_warmup: int,
+    seed: int,
+) -> None:
+    with open(input_file, encoding="utf-8") as f:
+        all_lines = [line.rstrip("\n") for line in f if line.strip()]
+    chosen = random.Random(seed).sample(
+        range(len(all_lines)), min(sample_size + n_warmup, len(all_lines))
+    )
+    lines = [all_lines[i] for i in chosen[:sample_size]]
+    warmup = [all_lines[i] for i in chosen[sample_size:]]
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for model_name in models:
+        for batch_chars in batch_chars_list:
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                result = executor.submit(
+                    run, model_name, batch_chars, lines, warmup
+                ).result()
+            share = result["time_share"]
+            print(
+                f"{model_name:<24} batch {result['batch_chars']:>6} chars: "
+                f"{result['sentences_per_second']:>8.1f} sentences/s "
+                f"{result['matches_per_second']:>8.1f} matches/s "
+                f"{result['peak_rss_mib']:>8.0f} MiB  "
+                f"spaCy {share['spacy']:.1%} npv_matcher {share['npv_matcher']:.1%} "
+                f"normalize_verb_span {share['normalize_verb_span']:.1%}",
+                file=sys.stderr,
+            )
+            results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "versions": {"python": platform.python_version(), "spacy": spacy.__version__},
+        "input_file": str(input_file),
+        "sample_size": len(lines),
+        "warmup_size": len(warmup),
+        "seed": seed,
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output_file is None:
+        print(text)
+    else:
+        output_file.write_text(text + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark NPV extraction throughput for each model and batch size."
+    )
+    parser.add_argument(
+        "--input-file",
+        type=Path,
+        default=Path("data/ted_corpus.txt"),
+        help="Text file the sample is drawn from (default: data/ted_corpus.txt)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="JSON file to write the results to (default: standard output)",
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=sorted(spacy.util.get_installed_models()),
+        help="spaCy models to benchmark (default: all installed models)",
+    )
+    parser.add_argument(
+        "--batch-chars",
+        type=batch_chars_arg,
+        nargs="+",
+        default=[None, 2000, 16000],
+        help="Characters per parse batch to benchmark, or 'auto' (default: auto 2000 16000)",
+    )
+    parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=2000,
+        help="Number of lines to extract from (default: 2000)",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=50,
+        help="Number of other lines processed before timing (default: 50)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Random seed of the sample (default: 42)",
+    )
+    args = parser.parse_args()
+    main(
+        args.input_file,
+        args.output,
+        args.models,
+        args.batch_chars,
+        args.sample_size,
+        args.warmup,
+        args.seed,
+    )
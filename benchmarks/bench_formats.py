@@ -0,0 +1,88 @@
+"""Compare file size and load time of NPV results stored as CSV, Parquet and Arrow IPC.
+
+For every `{corpus}_npvs_{model}.csv` in the data directory, the results are
+converted with `convert_results`, both row-per-match and aggregated, and each
+file is loaded the way `server.read_results` does. The time to build the
+server's aggregated table from each format is measured as well.
+
+Usage:
+    python benchmarks/bench_formats.py --data-dir data
+"""
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import polars as pl  # type: ignore
+
+from natsume_simple.pattern_extraction import RESULT_SUFFIXES, convert_results
+
+READERS = {"csv": pl.read_csv, "parquet": pl.read_parquet, "arrow": pl.read_ipc}
+
+
+def median_seconds(f: Callable[[], object], repeat: int) -> float:
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def load_aggregated(path: Path, output_format: str) -> pl.DataFrame:
+    df = READERS[output_format](path)
+    if "frequency" not in df.columns:
+        df = df.with_columns(pl.lit(1, dtype=pl.UInt32).alias("frequency"))
+    df = df.with_columns(pl.col("n", "p", "v", "corpus").cast(pl.String))
+    return df.group_by("n", "p", "v", "corpus").agg(pl.col("frequency").sum())
+
+
+def main(data_dir: Path, repeat: int) -> None:
+    print(
+        f"{'file':<40} {'format':<8} {'aggregated':<10} {'size (KiB)':>10} "
+        f"{'read (ms)':>10} {'db (ms)':>10}"
+    )
+    for csv_file in sorted(data_dir.glob("*_npvs_*.csv")):
+        with tempfile.TemporaryDirectory() as tmp:
+            for aggregate in (False, True):
+                for output_format in RESULT_SUFFIXES:
+                    work_file = Path(tmp) / csv_file.name
+                    shutil.copy(csv_file, work_file)
+                    if output_format != "csv" or aggregate:
+                        path = convert_results(work_file, output_format, aggregate)
+                    else:
+                        path = work_file
+                    read = READERS[output_format]
+                    read_ms = 1000 * median_seconds(lambda: read(path), repeat)
+                    db_ms = 1000 * median_seconds(
+                        lambda: load_aggregated(path, output_format), repeat
+                    )
+                    print(
+                        f"{csv_file.name:<40} {output_format:<8} {str(aggregate):<10} "
+                        f"{path.stat().st_size / 1024:>10.0f} {read_ms:>10.1f} {db_ms:>10.1f}"
+                    )
+                    path.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark NPV result file formats against the CSVs in the data directory."
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path("data"),
+        help="Directory containing {corpus}_npvs_{model}.csv files (default: data)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=20,
+        help="Number of timed loads per file; the median is reported (default: 20)",
+    )
+    args = parser.parse_args()
+    main(args.data_dir, args.repeat)
@@ -0,0 +1,107 @@
+"""Compare the throughput of `is_japanese` with the batched `japanese_mask`.
+
+Lines are taken from a text file, by default the TED corpus, and mixed with
+the same number of English-like lines of similar length so that both branches
+of the filter are exercised. The lines are classified one by one with
+`is_japanese`, in one batch with `japanese_mask`, and as files of
+`--lines-per-file` lines with `filter_non_japanese` using 1 and `--workers`
+processes. All results are checked to agree.
+
+Usage:
+    python benchmarks/bench_japanese_filter.py --input-file data/ted_corpus.txt
+"""
+
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from natsume_simple.data import filter_non_japanese, is_japanese, japanese_mask
+
+
+def lines_per_second(f: Callable[[], List[bool]], n_lines: int):
+    start = time.perf_counter()
+    result = f()
+    return n_lines / (time.perf_counter() - start), result
+
+
+def main(
+    input_file: Path, min_length: int, lines_per_file: int, workers: int, repeat: int
+) -> None:
+    rng = random.Random(42)
+    japanese = input_file.read_text(encoding="utf-8").splitlines() * repeat
+    english = [
+        "".join(rng.choice(string.ascii_letters + "     ") for _ in range(len(line)))
+        for line in japanese
+    ]
+    lines = japanese + english
+    rng.shuffle(lines)
+
+    loop_rate, expected = lines_per_second(
+        lambda: [is_japanese(line, min_length) for line in lines], len(lines)
+    )
+    batch_rate, mask = lines_per_second(
+        lambda: japanese_mask(lines, min_length).tolist(), len(lines)
+    )
+    assert mask == expected
+    print(f"{'is_japanese (per line)':<32} {loop_rate:>12,.0f} lines/s")
+    print(f"{'japanese_mask (one batch)':<32} {batch_rate:>12,.0f} lines/s")
+
+    kept = [line.rstrip() for line, keep in zip(lines, expected) if keep]
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(0, len(lines), lines_per_file):
+            (Path(tmp) / f"{i:08d}.txt").write_text(
+                "\n".join(lines[i : i + lines_per_file]) + "\n", encoding="utf-8"
+            )
+        for n in sorted({1, workers}):
+            rate, filtered = lines_per_second(
+                lambda: list(filter_non_japanese(Path(tmp), min_length, workers=n)),
+                len(lines),
+            )
+            # rglob does not promise an order, so compare the multisets.
+            assert sorted(filtered) == sorted(kept)
+            print(f"{f'filter_non_japanese ({n} workers)':<32} {rate:>12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Japanese line filter against the per-line implementation."
+    )
+    parser.add_argument(
+        "--input-file",
+        type=Path,
+        default=Path("data/ted_corpus.txt"),
+        help="Text file providing the Japanese lines (default: data/ted_corpus.txt)",
+    )
+    parser.add_argument(
+        "--min-length",
+        type=int,
+        default=200,
+        help="Minimum length passed to the filters (default: 200)",
+    )
+    parser.add_argument(
+        "--lines-per-file",
+        type=int,
+        default=2000,
+        help="Number of lines per file for filter_non_japanese (default: 2000)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes for filter_non_japanese (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Number of copies of the input lines (default: 1)",
+    )
+    args = parser.parse_args()
+    main(
+        args.input_file, args.min_length, args.lines_per_file, args.workers, args.repeat
+    )
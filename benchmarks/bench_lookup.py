@@ -0,0 +1,108 @@
+"""Compare noun/verb lookup latency of a full-table filter and `NPVIndex`.
+
+The aggregated table of a model is scaled to 1x, 10x and 100x its size by
+repeating it under renamed corpora, which mimics adding corpora: every key
+gets proportionally more rows. For a sample of nouns and verbs, weighted
+towards frequent ones, the latency of `db.filter(pl.col(...) == key)` is
+compared with `NPVIndex.noun`/`NPVIndex.verb` on a prebuilt, memory-mapped
+database file.
+
+Usage:
+    python benchmarks/bench_lookup.py --model ja_ginza_bert_large
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import polars as pl  # type: ignore
+
+from natsume_simple.database import build_database, load_database, open_database
+
+
+def latencies_us(lookup: Callable[[str], pl.DataFrame], keys: List[str]) -> List[float]:
+    times: List[float] = []
+    for key in keys:
+        start = time.perf_counter()
+        lookup(key)
+        times.append((time.perf_counter() - start) * 1e6)
+    return sorted(times)
+
+
+def percentile(times: List[float], p: float) -> float:
+    return times[min(len(times) - 1, int(p * len(times)))]
+
+
+def sample_keys(db: pl.DataFrame, column: str, n: int) -> List[str]:
+    counts = (
+        db.group_by(column)
+        .agg(pl.col("frequency").sum())
+        .sort("frequency", descending=True)
+    )
+    frequent = counts.head(n // 2)[column].to_list()
+    other = counts[column].sample(n - len(frequent), seed=42).to_list()
+    return frequent + other
+
+
+def main(model_name: str, data_dir: Path, scales: List[int], n_keys: int) -> None:
+    base = load_database(model_name, data_dir)
+    print(
+        f"{'scale':>6} {'rows':>10} {'column':>6} {'filter p50':>11} {'filter p99':>11} "
+        f"{'index p50':>10} {'index p99':>10}  (microseconds)"
+    )
+    for scale in scales:
+        db = pl.concat(
+            [base.with_columns(pl.col("corpus") + f"-{i}") for i in range(scale)]
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            # The scaled table is stored pre-aggregated as the results of one corpus.
+            scaled_dir = Path(tmp)
+            db.write_parquet(scaled_dir / f"ted_npvs_{model_name}.parquet")
+            build_database(model_name, scaled_dir)
+            index, _ = open_database(model_name, scaled_dir)
+
+            for column, lookup in (("n", index.noun), ("v", index.verb)):
+                keys = sample_keys(base, column, n_keys)
+                scan = latencies_us(lambda key: db.filter(pl.col(column) == key), keys)
+                indexed = latencies_us(lookup, keys)
+                print(
+                    f"{scale:>5}x {db.height:>10} {column:>6} "
+                    f"{statistics.median(scan):>11.0f} {percentile(scan, 0.99):>11.0f} "
+                    f"{statistics.median(indexed):>10.0f} {percentile(indexed, 0.99):>10.0f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark noun/verb lookup latency at several data sizes."
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="ja_ginza_bert_large",
+        help="Name of the spaCy model whose results are used (default: ja_ginza_bert_large)",
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path("data"),
+        help="Directory containing the extraction results (default: ./data)",
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="Multiples of the current data size to benchmark (default: 1 10 100)",
+    )
+    parser.add_argument(
+        "--keys",
+        type=int,
+        default=200,
+        help="Number of nouns and of verbs to look up (default: 200)",
+    )
+    args = parser.parse_args()
+    main(args.model, args.data_dir, args.scales, args.keys)
@@ -0,0 +1,87 @@
+"""Compare the throughput of `npv_matcher` and `npv_matcher_array`.
+
+Lines of a text file are parsed once and the docs are saved to and reloaded
+from a `DocBin` with only the tokenizer, as the match stage does. Both
+matchers are run over the reloaded docs, first with an empty verb-phrase
+memo and then with the memo filled by the previous pass, and the results are
+checked to agree.
+
+Usage:
+    python benchmarks/bench_matcher.py --input-file data/ted_corpus.txt
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from spacy.tokens import DocBin  # type: ignore
+
+from natsume_simple import pattern_extraction
+from natsume_simple.pattern_extraction import (
+    MATCHERS,
+    load_nlp_model,
+    load_tokenizer,
+    parse_docs,
+)
+
+
+def main(input_file: Path, model_name: str, n_lines: int, repeat: int) -> None:
+    nlp, _ = load_nlp_model(model_name)
+    with open(input_file, encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for _, line in zip(range(n_lines), f)]
+    doc_bin = DocBin(store_user_data=True, docs=parse_docs(lines, nlp))
+    tokenizer, suru_token = load_tokenizer(model_name)
+    docs = list(DocBin().from_bytes(doc_bin.to_bytes()).get_docs(tokenizer.vocab))
+
+    print(f"{len(docs)} docs (microseconds per doc, best of {repeat}):")
+    print(f"{'matcher':<8} {'empty memo':>11} {'filled memo':>12} {'matches':>8}")
+    expected = None
+    for name, matcher in MATCHERS.items():
+        times = {"empty": [], "filled": []}
+        for _ in range(repeat):
+            for memo in times:
+                if memo == "empty":
+                    pattern_extraction.verb_phrase_cache.clear()
+                start = time.perf_counter()
+                matches = [matcher(doc, suru_token) for doc in docs]
+                times[memo].append(time.perf_counter() - start)
+                if expected is None:
+                    expected = matches
+                assert matches == expected
+        print(
+            f"{name:<8} {min(times['empty']) / len(docs) * 1e6:>11.1f} "
+            f"{min(times['filled']) / len(docs) * 1e6:>12.1f} "
+            f"{sum(map(len, matches)):>8}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the token-walking and the array-backed NPV matcher."
+    )
+    parser.add_argument(
+        "--input-file",
+        type=Path,
+        default=Path("data/ted_corpus.txt"),
+        help="Text file whose lines are parsed (default: data/ted_corpus.txt)",
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="ja_ginza",
+        help="Name of the spaCy model used to parse (default: ja_ginza)",
+    )
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=3000,
+        help="Number of lines to parse (default: 3000)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timed passes per matcher and memo state (default: 3)",
+    )
+    args = parser.parse_args()
+    main(args.input_file, args.model, args.lines, args.repeat)
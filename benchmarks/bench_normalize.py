@@ -0,0 +1,195 @@
+"""Compare the previous verb-phrase normalization with the current one.
+
+Lines of a text file are parsed once. For the verb bunsetu of every match,
+the previous `normalize_verb_span`, which built intermediate lists and matched
+an uncompiled pattern, is timed against the current one. `npv_matcher` is then
+timed with the previous normalization, which computed the bunsetu span and
+normalized it for every match, and with the current one, which normalizes
+each verb once per doc and memoizes the result across docs, both with an
+empty memo and with the memo filled by a previous pass. All results are
+checked to agree.
+
+Usage:
+    python benchmarks/bench_normalize.py --input-file data/ted_corpus.txt
+"""
+
+import argparse
+import re
+import time
+from itertools import takewhile
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import ginza  # type: ignore
+from spacy.symbols import (  # type: ignore
+    ADP,
+    NOUN,
+    NUM,
+    PRON,
+    PROPN,
+    PUNCT,
+    SCONJ,
+    SYM,
+    VERB,
+    nsubj,
+    obj,
+    obl,
+)
+from spacy.tokens import Doc, Span, Token  # type: ignore
+
+from natsume_simple import pattern_extraction
+from natsume_simple.pattern_extraction import (
+    load_nlp_model,
+    npv_matcher,
+    pairwise,
+    parse_docs,
+    simple_lemma,
+)
+
+
+def previous_normalize_verb_span(
+    tokens: Doc | Span, suru_token: Token
+) -> Optional[str]:
+    clean_tokens = [token for token in tokens if token.pos not in {PUNCT, SYM}]
+    clean_tokens = list(
+        takewhile(
+            lambda token: (
+                token.pos not in {ADP, SCONJ}
+                and token.norm_ not in {"から", "ため", "たり", "こと", "よう"}
+            ),
+            clean_tokens,
+        )
+    )
+    if len(clean_tokens) == 1:
+        return simple_lemma(clean_tokens[0])
+
+    normalized_tokens: List[Token] = []
+    token_pairs: List[Tuple[Token, Token]] = list(pairwise(clean_tokens))
+    for i, (token, next_token) in enumerate(token_pairs):
+        normalized_tokens.append(token)
+        if next_token.lemma_ in ["ます", "た"]:
+            if re.match(r"^(五|上|下|サ|.変格|助動詞).+", ginza.inflection(token)):
+                break
+            else:
+                normalized_tokens.append(suru_token)
+                break
+        elif next_token.lemma_ == "だ":
+            break
+        elif i == len(token_pairs) - 1:
+            normalized_tokens.append(next_token)
+
+    if len(normalized_tokens) == 1:
+        return simple_lemma(normalized_tokens[0])
+
+    if not normalized_tokens:
+        return None
+
+    stem = normalized_tokens[0]
+    affixes = normalized_tokens[1:-1]
+    suffix = normalized_tokens[-1]
+    return "{}{}{}".format(
+        stem.text,
+        "".join(t.text for t in affixes),
+        simple_lemma(suffix),
+    )
+
+
+def previous_npv_matcher(doc: Doc, suru_token: Token) -> List[Tuple[str, str, str]]:
+    matches: List[Tuple[str, str, str]] = []
+    for token in doc[:-2]:
+        noun = token
+        case_particle = noun.nbor(1)
+        verb = token.head
+        if (
+            noun.pos in {NOUN, PROPN, PRON, NUM}
+            and noun.dep in {obj, obl, nsubj}
+            and verb.pos == VERB
+            and case_particle.dep_ == "case"
+            and case_particle.lemma_
+            in {"が", "を", "に", "で", "から", "より", "と", "へ"}
+            and case_particle.nbor().dep_ != "fixed"
+            and case_particle.nbor().head != case_particle.head
+        ):
+            vp_string = previous_normalize_verb_span(
+                ginza.bunsetu_span(verb), suru_token
+            )
+            if not vp_string:
+                continue
+            matches.append((noun.norm_, case_particle.norm_, vp_string))
+    return matches
+
+
+def seconds(f: Callable[[], object]) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = f()
+    return time.perf_counter() - start, result
+
+
+def main(input_file: Path, model_name: str, n_lines: int) -> None:
+    nlp, suru_token = load_nlp_model(model_name)
+    with open(input_file, encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for _, line in zip(range(n_lines), f)]
+    docs = parse_docs(lines, nlp)
+
+    spans = [
+        ginza.bunsetu_span(token.head)
+        for doc in docs
+        for token in doc[:-2]
+        if token.head.pos == VERB and token.nbor(1).dep_ == "case"
+    ]
+    previous_s, previous = seconds(
+        lambda: [previous_normalize_verb_span(span, suru_token) for span in spans]
+    )
+    current_s, current = seconds(
+        lambda: [
+            pattern_extraction.normalize_verb_span(span, suru_token) for span in spans
+        ]
+    )
+    assert previous == current
+    print(f"{len(spans)} verb bunsetu, normalize_verb_span (microseconds per call):")
+    print(f"  {'previous':<24} {previous_s / len(spans) * 1e6:>8.1f}")
+    print(f"  {'current':<24} {current_s / len(spans) * 1e6:>8.1f}")
+
+    pattern_extraction.verb_phrase_cache.clear()
+    variants = [
+        ("previous", lambda: [previous_npv_matcher(doc, suru_token) for doc in docs]),
+        ("current, empty memo", lambda: [npv_matcher(doc, suru_token) for doc in docs]),
+        (
+            "current, filled memo",
+            lambda: [npv_matcher(doc, suru_token) for doc in docs],
+        ),
+    ]
+    print(f"{len(docs)} docs, npv_matcher (microseconds per doc):")
+    expected = None
+    for name, run in variants:
+        elapsed, matches = seconds(run)
+        if expected is None:
+            expected = matches
+        assert matches == expected
+        print(f"  {name:<24} {elapsed / len(docs) * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark verb-phrase normalization in the NPV matcher."
+    )
+    parser.add_argument(
+        "--input-file",
+        type=Path,
+        default=Path("data/ted_corpus.txt"),
+        help="Text file whose lines are parsed (default: data/ted_corpus.txt)",
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="ja_ginza",
+        help="Name of the spaCy model used to parse (default: ja_ginza)",
+    )
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=2000,
+        help="Number of lines to parse (default: 2000)",
+    )
+    args = parser.parse_args()
+    main(args.input_file, args.model, args.lines)
@@ -0,0 +1,120 @@
+"""Compare `/search/{query}` latency of a full-table scan and `SearchIndex`.
+
+The vocabulary of a model's aggregated table is scaled to 1x and 10x its size
+by adding copies of every noun and verb with a distinct kana appended, so each
+character and bigram occurs in proportionally more terms. Queries are
+prefixes and infixes of 1 to 3 characters taken from frequent and random
+terms. The scan is the previous implementation of the endpoint: a
+`str.contains` filter over both columns followed by counting in Python.
+
+Usage:
+    python benchmarks/bench_search.py --model ja_ginza_bert_large
+"""
+
+import argparse
+import random
+import statistics
+import time
+from collections import Counter
+from typing import Callable, List
+
+import polars as pl  # type: ignore
+
+from natsume_simple.database import SearchIndex, load_database
+
+
+def scan(db: pl.DataFrame, query: str) -> List[tuple]:
+    matches = (
+        db.filter(
+            pl.col("n").str.contains(query, literal=True)
+            | pl.col("v").str.contains(query, literal=True)
+        )
+        .select(["n", "v"])
+        .to_dicts()
+    )
+    result = []
+    for row in matches:
+        if query in row["n"]:
+            result.append((row["n"], "n"))
+        if query in row["v"]:
+            result.append((row["v"], "v"))
+    counts = Counter(result)
+    return sorted(counts, key=lambda x: counts[x], reverse=True)
+
+
+def latencies_us(search: Callable[[str], object], queries: List[str]) -> List[float]:
+    times: List[float] = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        times.append((time.perf_counter() - start) * 1e6)
+    return sorted(times)
+
+
+def percentile(times: List[float], p: float) -> float:
+    return times[min(len(times) - 1, int(p * len(times)))]
+
+
+def sample_queries(db: pl.DataFrame, n: int) -> List[str]:
+    rng = random.Random(42)
+    terms = db["n"].to_list() + db["v"].to_list()
+    queries = []
+    for _ in range(n):
+        term = rng.choice(terms)
+        length = rng.randint(1, min(3, len(term)))
+        start = rng.randint(0, len(term) - length)
+        queries.append(term[start : start + length])
+    return queries
+
+
+def main(model_name: str, scales: List[int], n_queries: int) -> None:
+    base = load_database(model_name)
+    queries = sample_queries(base, n_queries)
+    print(
+        f"{'scale':>6} {'nouns':>8} {'verbs':>8} {'build (s)':>10} {'scan p50':>9} "
+        f"{'scan p99':>9} {'index p50':>10} {'index p99':>10}  (microseconds)"
+    )
+    for scale in scales:
+        db = pl.concat(
+            [
+                base.with_columns(pl.col("n", "v") + chr(ord("ぁ") + i)) if i else base
+                for i in range(scale)
+            ]
+        )
+        start = time.perf_counter()
+        search_index = SearchIndex.from_table(db)
+        build = time.perf_counter() - start
+        scanned = latencies_us(lambda query: scan(db, query), queries)
+        indexed = latencies_us(search_index.search, queries)
+        print(
+            f"{scale:>5}x {len(search_index.terms['n']):>8} {len(search_index.terms['v']):>8} "
+            f"{build:>10.2f} {statistics.median(scanned):>9.0f} {percentile(scanned, 0.99):>9.0f} "
+            f"{statistics.median(indexed):>10.0f} {percentile(indexed, 0.99):>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark search query latency at several vocabulary sizes."
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="ja_ginza_bert_large",
+        help="Name of the spaCy model whose results are used (default: ja_ginza_bert_large)",
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10],
+        help="Multiples of the current vocabulary size to benchmark (default: 1 10)",
+    )
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=500,
+        help="Number of search queries to time (default: 500)",
+    )
+    args = parser.parse_args()
+    main(args.model, args.scales, args.queries)
@@ -0,0 +1,107 @@
+"""Compare latency and CPU time of the npv endpoint serialization paths.
+
+The previous path, which returned `to_dicts()` and let FastAPI validate and
+encode the rows, is mounted next to the server's endpoints in a test app and
+requested for the verbs with the most rows. The server's endpoints are
+requested as JSON, gzip- and brotli-compressed JSON and Arrow IPC stream, with
+the response cache disabled so that every request serializes its rows. Wall
+and process CPU time include the in-process test client; the raw body is read
+without decompressing it.
+
+Usage:
+    python benchmarks/bench_serialization.py --requests 200
+"""
+
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List
+
+from fastapi.testclient import TestClient  # type: ignore
+
+from natsume_simple import server
+
+VARIANTS = {
+    "to_dicts": ("/old/npv/verb/{}", {}),
+    "json": ("/npv/verb/{}", {"accept-encoding": "identity"}),
+    "json+gzip": ("/npv/verb/{}", {"accept-encoding": "gzip"}),
+    "json+br": ("/npv/verb/{}", {"accept-encoding": "br"}),
+    "arrow": (
+        "/npv/verb/{}",
+        {"accept": server.ARROW_STREAM, "accept-encoding": "identity"},
+    ),
+}
+
+
+@server.app.get("/old/npv/verb/{verb}")
+def read_npv_verb_dicts(verb: str) -> List[Dict[str, Any]]:
+    return (
+        server.registry.get(server.default_model).index.verb(verb).drop("v").to_dicts()
+    )
+
+
+def measure(client: TestClient, url: str, headers: Dict[str, str], n: int):
+    wall: List[float] = []
+    cpu: List[float] = []
+    size = 0
+    for _ in range(n):
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        with client.stream("GET", url, headers=headers) as response:
+            size = len(b"".join(response.iter_raw()))
+        wall.append((time.perf_counter() - start_wall) * 1000)
+        cpu.append((time.process_time() - start_cpu) * 1000)
+    wall.sort()
+    return (
+        size,
+        statistics.median(wall),
+        wall[int(0.99 * (n - 1))],
+        statistics.mean(cpu),
+    )
+
+
+def main(n_verbs: int, n_requests: int) -> None:
+    server.response_cache.max_entries = 0
+    # Mounted after the static files app, so move the route in front of it.
+    server.app.router.routes.insert(0, server.app.router.routes.pop())
+    client = TestClient(server.app)
+    verbs = (
+        server.registry.get(server.default_model)
+        .index.table.group_by("v")
+        .len()
+        .sort("len", descending=True)
+        .head(n_verbs)
+        .rows()
+    )
+    print(
+        f"{'verb':<8} {'rows':>6} {'variant':<10} {'bytes':>8} "
+        f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'cpu (ms)':>9}"
+    )
+    for verb, rows in verbs:
+        for name, (url, headers) in VARIANTS.items():
+            if name == "json+br" and server.brotli is None:
+                continue
+            size, p50, p99, cpu = measure(client, url.format(verb), headers, n_requests)
+            print(
+                f"{verb:<8} {rows:>6} {name:<10} {size:>8} "
+                f"{p50:>9.2f} {p99:>9.2f} {cpu:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark npv endpoint serialization for the largest result sets."
+    )
+    parser.add_argument(
+        "--verbs",
+        type=int,
+        default=3,
+        help="Number of verbs with the most rows to request (default: 3)",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=200,
+        help="Number of timed requests per verb and variant (default: 200)",
+    )
+    args = parser.parse_args()
+    main(args.verbs, args.requests)
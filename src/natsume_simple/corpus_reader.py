@@ -0,0 +1,270 @@
+import io
+import mmap
+import os
+import random
+from itertools import islice
+from pathlib import Path
+from typing import List, Optional, TextIO
+
+import numpy as np  # type: ignore
+
+from natsume_simple.log import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def line_index_path(corpus_file: Path) -> Path:
+    """Return the path of the line-offset index of a corpus file."""
+    return corpus_file.with_name(corpus_file.name + ".offsets.npy")
+
+
+def build_line_index(corpus_file: Path, chunk_size: int = 64 << 20) -> np.ndarray:
+    """Compute the byte offset at which every line of a text file starts.
+
+    The file is scanned in chunks of raw bytes, so it is neither decoded nor
+    held in memory as a whole. Lines end at "\\n", "\\r\\n" or a lone "\\r",
+    as with the universal newlines of `open`, so that line i of the index is
+    line i of the file read in text mode.
+
+    Args:
+        corpus_file: Text file to index
+        chunk_size: Number of bytes scanned at a time
+
+    Returns:
+        Array of the start offsets of all lines followed by the file size, so
+        that line i spans bytes offsets[i] to offsets[i + 1]. A final line
+        without a newline is counted as a line.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     path = Path(d) / "corpus.txt"
+        ...     _ = path.write_bytes("一行目\\n二行目\\n".encode("utf-8"))
+        ...     build_line_index(path, chunk_size=4).tolist()
+        ...     _ = path.write_bytes(b"a\\n\\nb")
+        ...     build_line_index(path).tolist()
+        ...     _ = path.write_bytes(b"a\\r\\nb\\rc\\r")
+        ...     build_line_index(path, chunk_size=2).tolist()
+        [0, 10, 20]
+        [0, 2, 3, 4]
+        [0, 3, 5, 7]
+    """
+    starts = [np.zeros(1, dtype=np.uint64)]
+    size = 0
+    # Whether the previous chunk ended in CR, which ends a line unless the
+    # next chunk starts with LF.
+    pending_cr = False
+    with open(corpus_file, "rb") as f:
+        while chunk := f.read(chunk_size):
+            data = np.frombuffer(chunk, dtype=np.uint8)
+            if pending_cr and data[0] != 0x0A:
+                starts.append(np.array([size], dtype=np.uint64))
+            lf = data == 0x0A
+            cr = data == 0x0D
+            ends = lf.copy()
+            ends[:-1] |= cr[:-1] & ~lf[1:]
+            pending_cr = bool(cr[-1])
+            starts.append((np.flatnonzero(ends) + (size + 1)).astype(np.uint64))
+            size += len(chunk)
+    if pending_cr:
+        starts.append(np.array([size], dtype=np.uint64))
+    offsets = np.concatenate(starts)
+    # A start at the end of the file is the end of a final terminated line.
+    if offsets[-1] != size:
+        offsets = np.append(offsets, np.uint64(size))
+    dtype = np.uint32 if size < 1 << 32 else np.uint64
+    return offsets.astype(dtype)
+
+
+def write_line_index(corpus_file: Path) -> Path:
+    """Build the line-offset index of a corpus file and save it next to the file.
+
+    Args:
+        corpus_file: Text file to index
+
+    Returns:
+        Path of the written index
+    """
+    index_file = line_index_path(corpus_file)
+    tmp_file = index_file.with_name(index_file.name + ".tmp.npy")
+    np.save(tmp_file, build_line_index(corpus_file))
+    os.replace(tmp_file, index_file)
+    return index_file
+
+
+def load_line_index(corpus_file: Path) -> Optional[np.ndarray]:
+    """Memory map the line-offset index of a corpus file if it is up to date.
+
+    Returns:
+        The offsets, or None if there is no index or the corpus file was
+        modified after the index was written
+    """
+    index_file = line_index_path(corpus_file)
+    try:
+        if index_file.stat().st_mtime_ns < corpus_file.stat().st_mtime_ns:
+            return None
+        offsets = np.load(index_file, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        return None
+    if offsets[-1] != corpus_file.stat().st_size:
+        return None
+    return offsets
+
+
+def ensure_line_index(corpus_file: Path) -> np.ndarray:
+    """Return the line-offset index of a corpus file, writing it if missing or stale.
+
+    If the index cannot be written, e.g. in a read-only directory, it is kept
+    in memory only.
+    """
+    offsets = load_line_index(corpus_file)
+    if offsets is not None:
+        return offsets
+    try:
+        write_line_index(corpus_file)
+    except OSError:
+        logger.warning(f"Could not write the line index of {corpus_file}.")
+        return build_line_index(corpus_file)
+    return np.load(line_index_path(corpus_file), mmap_mode="r")
+
+
+class _ByteRange(io.RawIOBase):
+    """Read-only raw stream of the bytes `start` to `end` (exclusive) of a file."""
+
+    def __init__(self, path: Path, start: int, end: int):
+        self.file = open(path, "rb")
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer)[: self.remaining]
+        n = self.file.readinto(view) or 0
+        self.remaining -= n
+        return n
+
+    def close(self) -> None:
+        self.file.close()
+        super().close()
+
+
+def open_lines(corpus_file: Path, start: int = 0, end: Optional[int] = None) -> TextIO:
+    """Open a text file for reading lines `start` to `end`.
+
+    With an up-to-date index the file is positioned by seeking to the line's
+    offset; otherwise the preceding lines are read and skipped. With `end`,
+    reading stops at the byte offset of line `end`, for which the index is
+    written if it is missing or stale. Either way the lines are decoded as by
+    `open(corpus_file, encoding="utf-8")`.
+
+    Args:
+        corpus_file: UTF-8 text file to read
+        start: Index of the first line to read
+        end: Index one past the last line to read (default: the last line)
+
+    Returns:
+        Text file object positioned at the start of line `start`
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     path = Path(d) / "corpus.txt"
+        ...     _ = path.write_bytes(b"a\\rb\\r\\nc\\nd")
+        ...     with open_lines(path, 1, 3) as f:
+        ...         f.readlines()
+        ['b\\n', 'c\\n']
+    """
+    if end is not None:
+        offsets = ensure_line_index(corpus_file)
+        last = len(offsets) - 1
+        raw = _ByteRange(
+            corpus_file, int(offsets[min(start, last)]), int(offsets[min(end, last)])
+        )
+        return io.TextIOWrapper(io.BufferedReader(raw), encoding="utf-8")
+    offsets = load_line_index(corpus_file) if start else None
+    if offsets is not None:
+        raw = open(corpus_file, "rb")
+        raw.seek(int(offsets[min(start, len(offsets) - 1)]))
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    f = open(corpus_file, "r", encoding="utf-8")
+    for _ in islice(f, start):
+        pass
+    return f
+
+
+class CorpusReader:
+    """Random access to the lines of a memory-mapped corpus file.
+
+    Lines are located through the line-offset index, which is written next to
+    the corpus if it is missing or stale, and only the bytes of the requested
+    lines are read and decoded. Fetching a line, a range of lines or a random
+    sample therefore takes time independent of the size of the corpus.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     path = Path(d) / "ted-corpus.txt"
+        ...     _ = path.write_text("".join(f"{i}行目\\n" for i in range(100)))
+        ...     with CorpusReader(path) as reader:
+        ...         len(reader), reader[42], reader.lines(98, 200)
+        ...         sorted(reader.sample(3, random.Random(0))) == sorted(
+        ...             reader.sample(3, random.Random(0)))
+        (100, '42行目', ['98行目', '99行目'])
+        True
+    """
+
+    def __init__(self, corpus_file: Path):
+        """Open a corpus file and its line-offset index."""
+        self.corpus_file = corpus_file
+        self.offsets = ensure_line_index(corpus_file)
+        self.file = open(corpus_file, "rb")
+        self.data = (
+            mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.offsets[-1] > 0
+            else b""
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"Line {i} is out of range")
+        i %= len(self)
+        line = self.data[int(self.offsets[i]) : int(self.offsets[i + 1])]
+        return line.decode("utf-8").removesuffix("\n").removesuffix("\r")
+
+    def lines(self, start: int, end: Optional[int] = None) -> List[str]:
+        """Return lines `start` to `end` (exclusive, default: the last line)."""
+        return [self[i] for i in range(*slice(start, end).indices(len(self)))]
+
+    def sample(
+        self, sample_size: int, rng: Optional[random.Random] = None
+    ) -> List[str]:
+        """Return a uniform random sample of lines in random order.
+
+        Args:
+            sample_size: Number of lines to sample
+            rng: Random number generator (default: the `random` module)
+
+        Returns:
+            The sampled lines, or all lines in random order if there are fewer
+        """
+        rng = rng or random.Random(random.random())
+        return [
+            self[i] for i in rng.sample(range(len(self)), min(sample_size, len(self)))
+        ]
+
+    def close(self) -> None:
+        """Unmap and close the corpus file."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> "CorpusReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,15 +1,25 @@
 import argparse
+import json
+import os
 import random
 import subprocess
+import time
 import urllib.request
 import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Iterator, List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import datasets  # type: ignore
+import numpy as np  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
 
+from natsume_simple.corpus_reader import CorpusReader, write_line_index
 from natsume_simple.log import setup_logger
-from natsume_simple.utils import set_random_seed
+from natsume_simple.utils import file_sha256, set_random_seed
+
+if TYPE_CHECKING:
+    import datasets  # type: ignore
 
 logger = setup_logger(__name__)
 
@@ -34,24 +44,100 @@ def download_jnlp_corpus(data_dir: Path) -> None:
         z.extractall(data_dir)
 
 
-def convert_latex_to_text(corpus_dir: Path) -> None:
-    """Convert LaTeX files to plain text using pandoc.
+def load_manifest(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Load a conversion manifest, or return an empty one if there is none."""
+    if not path.is_file():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: Path, manifest: Dict[str, Dict[str, Any]]) -> None:
+    """Atomically write a conversion manifest."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def needs_conversion(
+    latex_file: Path, text_file: Path, entry: Optional[Dict[str, Any]]
+) -> Tuple[bool, Dict[str, Any]]:
+    """Decide whether a LaTeX file has to be (re)converted.
 
-    Finds all .tex files in the directory (recursively) and converts them to .txt files.
-    Skips files that have already been converted.
+    A file is skipped if its manifest entry records the same size and
+    modification time, or the same contents hash, as the current source. A
+    source whose last conversion failed is skipped until it changes, and one
+    whose entry records no finished conversion is always converted. Without
+    an entry, an output newer than its source, e.g. from a run before
+    manifests were kept, is adopted as is.
 
     Args:
-        corpus_dir: Directory containing LaTeX files to convert
+        latex_file: Source LaTeX file
+        text_file: Converted text file
+        entry: Manifest entry of the source, if any
+
+    Returns:
+        Tuple of whether to convert and the entry describing the current source
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     tex, txt = Path(d) / "a.tex", Path(d) / "a.txt"
+        ...     _ = tex.write_text("本文")
+        ...     convert, entry = needs_conversion(tex, txt, None)
+        ...     convert
+        ...     entry["returncode"] = 0
+        ...     _ = txt.write_text("本文")
+        ...     needs_conversion(tex, txt, entry)[0]
+        ...     _ = tex.write_text("新しい本文")
+        ...     needs_conversion(tex, txt, entry)[0]
+        ...     unfinished = {k: entry[k] for k in ["mtime_ns", "size"]}
+        ...     needs_conversion(tex, txt, unfinished)[0]
+        True
+        False
+        True
+        True
     """
-    latex_files = corpus_dir.rglob("*.tex")
+    stat = latex_file.stat()
+    source = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    if entry is not None and "returncode" not in entry:
+        return True, source
+    if entry is None:
+        if text_file.is_file() and text_file.stat().st_mtime_ns >= stat.st_mtime_ns:
+            return False, {**source, "sha256": file_sha256(latex_file), "returncode": 0}
+        return True, source
+    if entry.get("returncode") == 0 and not text_file.is_file():
+        return True, source
+    if all(entry.get(key) == value for key, value in source.items()):
+        return False, entry
+    sha256 = file_sha256(latex_file)
+    if entry.get("sha256") == sha256:
+        return False, {**entry, **source}
+    return True, {**source, "sha256": sha256}
+
+
+def run_pandoc(
+    latex_file: Path, text_file: Path, timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """Convert one LaTeX file to plain text with pandoc.
+
+    The output is written to a temporary file and renamed into place, so an
+    interrupted conversion never leaves a partial text file.
 
-    for latex_file in latex_files:
-        text_file = latex_file.with_suffix(".txt")
-        logger.info(f"{latex_file} => {text_file}")
-        if text_file.is_file():
-            logger.info("File exists, skipping.")
-            continue
+    Args:
+        latex_file: Source LaTeX file
+        text_file: Text file to write
+        timeout: Seconds after which pandoc is killed (default: no limit)
 
+    Returns:
+        Dictionary with the pandoc return code (-1 on timeout or if pandoc
+        could not be run), the seconds the conversion took and, on failure,
+        the end of pandoc's error output
+    """
+    tmp_file = text_file.with_name(text_file.name + ".tmp")
+    start = time.perf_counter()
+    try:
         p = subprocess.run(
             [
                 "pandoc",
@@ -66,11 +152,106 @@ def convert_latex_to_text(corpus_dir: Path) -> None:
                 "-s",
                 latex_file,
                 "-o",
-                text_file,
-            ]
+                tmp_file,
+            ],
+            capture_output=True,
+            timeout=timeout,
         )
-        if p.returncode != 0:
-            logger.error("Failed to convert using pandoc, skipping!")
+        returncode = p.returncode
+        error = p.stderr.decode("utf-8", errors="replace")[-1000:]
+    except subprocess.TimeoutExpired:
+        returncode, error = -1, f"Timed out after {timeout} seconds"
+    except OSError as e:
+        returncode, error = -1, f"Could not run pandoc: {e}"
+    result: Dict[str, Any] = {
+        "returncode": returncode,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if returncode == 0:
+        os.replace(tmp_file, text_file)
+    else:
+        tmp_file.unlink(missing_ok=True)
+        result["error"] = error
+    return result
+
+
+def convert_latex_to_text(
+    corpus_dir: Path, workers: int = 1, timeout: Optional[float] = 600
+) -> Dict[str, Dict[str, Any]]:
+    """Convert LaTeX files to plain text using pandoc.
+
+    Finds all .tex files in the directory (recursively) and converts them to .txt files,
+    running up to `workers` pandoc processes at a time.
+    Conversions are recorded in `conversion-manifest.json` in `corpus_dir`
+    with the size, modification time and hash of each source, the time pandoc
+    took and any error, so that only new and changed sources are converted on
+    later runs (see `needs_conversion`).
+
+    Args:
+        corpus_dir: Directory containing LaTeX files to convert
+        workers: Number of concurrent pandoc processes (default: 1)
+        timeout: Seconds after which a single conversion is abandoned (default: 600)
+
+    Returns:
+        The manifest, mapping source paths relative to `corpus_dir` to their entries
+    """
+    manifest_file = corpus_dir / "conversion-manifest.json"
+    previous = load_manifest(manifest_file)
+
+    # Entries of sources that no longer exist are dropped. Those of pending
+    # sources are only written once their conversion has finished, so that an
+    # interrupted run leaves them to be converted by the next.
+    manifest: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    n_sources = 0
+    for latex_file in sorted(corpus_dir.rglob("*.tex")):
+        n_sources += 1
+        key = latex_file.relative_to(corpus_dir).as_posix()
+        text_file = latex_file.with_suffix(".txt")
+        convert, entry = needs_conversion(latex_file, text_file, previous.get(key))
+        if convert:
+            pending.append((key, latex_file, text_file, entry))
+        else:
+            manifest[key] = entry
+    logger.info(
+        f"Converting {len(pending)} of {n_sources} LaTeX files with {workers} workers."
+    )
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(run_pandoc, latex_file, text_file, timeout): (
+                key,
+                latex_file,
+                text_file,
+                entry,
+            )
+            for key, latex_file, text_file, entry in pending
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            key, latex_file, text_file, entry = futures[future]
+            result = future.result()
+            entry = {**entry, **result}
+            if "sha256" not in entry:
+                entry["sha256"] = file_sha256(latex_file)
+            manifest[key] = entry
+            if result["returncode"] == 0:
+                entry.pop("error", None)
+                logger.info(f"{latex_file} => {text_file} ({result['seconds']}s)")
+            else:
+                logger.error(f"Failed to convert {latex_file} using pandoc, skipping!")
+            if i % 100 == 0:
+                save_manifest(manifest_file, manifest)
+    save_manifest(manifest_file, manifest)
+
+    failed = sorted(
+        key for key, entry in manifest.items() if entry.get("returncode") != 0
+    )
+    if failed:
+        logger.warning(f"{len(failed)} LaTeX files failed to convert: {failed[:10]}")
+    timed = [key for key, *_ in pending if "seconds" in manifest.get(key, {})]
+    for key in sorted(timed, key=lambda key: -manifest[key]["seconds"])[:5]:
+        logger.info(f"Slowest conversion: {key} ({manifest[key]['seconds']}s)")
+    return manifest
 
 
 def is_japanese(line: str, min_length: int = 200) -> bool:
@@ -142,28 +323,103 @@ def is_japanese(line: str, min_length: int = 200) -> bool:
     return (japanese_char_count / len(line)) >= 0.5
 
 
-def filter_non_japanese(dir: Path, min_length: int = 200) -> Iterator[str]:
+# Lookup table over all code points, 1 for those counted as Japanese by `is_japanese`.
+JAPANESE_CODEPOINTS = np.zeros(0x110000, dtype=np.uint8)
+for _start, _end in [
+    (0x3040, 0x309F),  # Hiragana
+    (0x30A0, 0x30FF),  # Katakana
+    (0x4E00, 0x9FFF),  # Kanji
+    (0xFF00, 0xFF5E),  # Fullwidth ASCII variants
+    (0x3000, 0x303F),  # Japanese punctuation and symbols
+    (0x31F0, 0x31FF),  # Additional CJK symbols and punctuation
+    (0x3400, 0x4DBF),  # Additional Kanji
+]:
+    JAPANESE_CODEPOINTS[_start : _end + 1] = 1
+
+
+def japanese_mask(lines: List[str], min_length: int = 200) -> np.ndarray:
+    """Apply `is_japanese` to a batch of lines at once.
+
+    The stripped lines are joined into one UTF-32 buffer, every code point is
+    classified through a lookup table, and the Japanese characters of each line
+    are summed segment-wise, so no Python code runs per character.
+
+    Args:
+        lines: Lines of text to classify
+        min_length: Minimum length of a line to be judged by its share of
+            Japanese characters rather than requiring all of them (default: 200)
+
+    Returns:
+        Boolean array whose i-th element equals `is_japanese(lines[i], min_length)`
+
+    Examples:
+        >>> lines = ["これは日本語の文章です。", "abc", "", "日本語とEnglishの混ざった文", " テスト\u3000"]
+        >>> japanese_mask(lines, min_length=5).tolist()
+        [True, False, False, True, True]
+        >>> [is_japanese(line, min_length=5) for line in lines]
+        [True, False, False, True, True]
+    """
+    stripped = [line.strip() for line in lines]
+    lengths = np.fromiter(map(len, stripped), dtype=np.int64, count=len(stripped))
+    codepoints = np.frombuffer(
+        "".join(stripped).encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+    )
+    japanese_counts = np.zeros(len(stripped), dtype=np.int64)
+    nonempty = lengths > 0
+    if nonempty.any():
+        starts = (np.cumsum(lengths) - lengths)[nonempty]
+        japanese_counts[nonempty] = np.add.reduceat(
+            np.take(JAPANESE_CODEPOINTS, codepoints), starts, dtype=np.int64
+        )
+    return nonempty & np.where(
+        lengths < min_length,
+        japanese_counts == lengths,
+        2 * japanese_counts >= lengths,
+    )
+
+
+def filter_japanese_file(file: Path, min_length: int = 200) -> List[str]:
+    """Return the lines of a text file that `is_japanese` keeps, right-stripped."""
+    with open(file, encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip() for line in f]
+    mask = japanese_mask(lines, min_length)
+    return [line for line, keep in zip(lines, mask) if keep]
+
+
+def filter_non_japanese(
+    dir: Path, min_length: int = 200, workers: int = 1
+) -> Iterator[str]:
     """Filter out non-Japanese text from converted files.
 
     This function reads text files and filters out lines that are likely not Japanese text.
+    Files are filtered in batches with `japanese_mask`, in parallel when
+    `workers` is more than 1, and their lines are yielded in file order.
 
     Args:
         dir: Path to directory containing text files to filter
         min_length: Minimum length of lines to keep (default: 200)
+        workers: Number of processes filtering files (default: 1)
 
     Yields:
         Lines of text that pass the Japanese text filters, stripped of whitespace on the end
     """
-    files = dir.rglob("*.txt")
-    for file in files:
-        with open(file, encoding="utf-8", errors="replace") as f:
-            for line in f:
-                line = line.rstrip()
-                if is_japanese(line, min_length):
-                    yield line
-
-
-def prepare_jnlp_corpus(data_dir: Path) -> int:
+    files = list(dir.rglob("*.txt"))
+    if workers <= 1:
+        for file in files:
+            yield from filter_japanese_file(file, min_length)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for lines in executor.map(
+            filter_japanese_file,
+            files,
+            [min_length] * len(files),
+            chunksize=max(1, len(files) // (workers * 4)),
+        ):
+            yield from lines
+
+
+def prepare_jnlp_corpus(data_dir: Path, workers: int = 1) -> int:
     """Prepare the JNLP corpus by downloading, converting, and filtering.
 
     Downloads the corpus, converts LaTeX to text, filters non-Japanese content,
@@ -171,76 +427,149 @@ def prepare_jnlp_corpus(data_dir: Path) -> int:
 
     Args:
         data_dir: Directory for storing the corpus data
+        workers: Number of concurrent pandoc conversions and of processes
+            filtering the converted files (default: 1)
 
     Returns:
         Number of lines in the prepared corpus
     """
     corpus_dir = data_dir / "NLP_LATEX_CORPUS"
     download_jnlp_corpus(data_dir)
-    convert_latex_to_text(corpus_dir)
+    convert_latex_to_text(corpus_dir, workers)
 
     logger.info("Filtering and writing JNLP corpus...")
-    lines = list(filter_non_japanese(dir=corpus_dir))
+    lines = filter_non_japanese(dir=corpus_dir, workers=workers)
+    n_lines = save_corpus(data_dir, "jnlp", lines)
+    return n_lines
+
+
+# Datasets making up the TED corpus: cache name, `load_dataset` arguments.
+TED_DATASETS: List[Tuple[str, Tuple[str, ...], Dict[str, Any]]] = [
+    (
+        "ted_talks_iwslt-2014",
+        ("ted_talks_iwslt",),
+        {"language_pair": ("en", "ja"), "year": "2014", "trust_remote_code": True},
+    ),
+    (
+        "ted_talks_iwslt-2015",
+        ("ted_talks_iwslt",),
+        {"language_pair": ("en", "ja"), "year": "2015"},
+    ),
+    (
+        "ted_talks_iwslt-2016",
+        ("ted_talks_iwslt",),
+        {"language_pair": ("en", "ja"), "year": "2016"},
+    ),
+    ("iwslt2017-ja-en", ("iwslt2017", "iwslt2017-ja-en"), {"trust_remote_code": True}),
+]
+
+
+def japanese_translations(dataset: "datasets.Dataset") -> pa.ChunkedArray:
+    """Extract the Japanese side of a translation dataset as an Arrow column.
+
+    The `ja` field is taken from the struct column of the underlying Arrow
+    table, so no Python dict is created per row.
 
-    output_file = data_dir / "jnlp-corpus.txt"
-    with open(output_file, "w", encoding="utf-8") as f:
-        for line in lines:
-            f.write(f"{line}\n")
+    Examples:
+        >>> import datasets
+        >>> dataset = datasets.Dataset.from_dict(
+        ...     {"translation": [{"en": "a book", "ja": "本 "}, {"en": "yes", "ja": "はい"}]}
+        ... )
+        >>> japanese_translations(dataset).to_pylist()
+        ['本 ', 'はい']
+    """
+    return pc.struct_field(dataset.data.column("translation"), "ja")
 
-    logger.info(f"JNLP corpus saved to {output_file}")
-    return len(lines)
 
+def load_ted_dataset(
+    name: str, args: Tuple[str, ...], kwargs: Dict[str, Any], cache_dir: Path
+) -> pa.ChunkedArray:
+    """Load the Japanese side of one TED dataset, from the local cache if present.
 
-def get_ted_corpus() -> List[str]:
-    """Download and combine TED talk transcripts from multiple years.
+    On a cache miss the dataset is loaded through `datasets`, which itself
+    works offline from the Hugging Face cache (`HF_DATASETS_OFFLINE=1`), and
+    the column is written to `{cache_dir}/{name}.arrow`.
 
-    Downloads Japanese transcripts from TED talks using the datasets library,
-    combining data from 2014-2017.
+    Args:
+        name: Name of the cache file
+        args: Positional arguments of `datasets.load_dataset`
+        kwargs: Keyword arguments of `datasets.load_dataset`
+        cache_dir: Directory of the cached columns
 
     Returns:
-        List of Japanese sentences from TED talks, stripped of whitespace
+        The Japanese sentences of the training split
     """
-    logger.info("Downloading TED corpus...")
-
-    ted_dataset_2014 = datasets.load_dataset(
-        "ted_talks_iwslt",
-        language_pair=("en", "ja"),
-        year="2014",
-        trust_remote_code=True,
-    )
-    ted_dataset_2015 = datasets.load_dataset(
-        "ted_talks_iwslt", language_pair=("en", "ja"), year="2015"
-    )
-    ted_dataset_2016 = datasets.load_dataset(
-        "ted_talks_iwslt", language_pair=("en", "ja"), year="2016"
-    )
-    ted_dataset_2017jaen = datasets.load_dataset(
-        "iwslt2017", "iwslt2017-ja-en", trust_remote_code=True
+    cache_file = cache_dir / f"{name}.arrow"
+    if cache_file.exists():
+        with pa.memory_map(str(cache_file)) as source:
+            return pa.ipc.open_file(source).read_all().column("ja")
+    # Imported on a cache miss only, as importing `datasets` takes about a second.
+    import datasets  # type: ignore
+
+    start = time.perf_counter()
+    dataset = datasets.load_dataset(*args, split="train", **kwargs)
+    ja = japanese_translations(dataset)
+    table = pa.table({"ja": ja})
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    with pa.OSFile(str(tmp_file), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_file, cache_file)
+    logger.info(
+        f"Loaded {name} ({len(ja)} sentences) in {time.perf_counter() - start:.1f}s"
     )
+    return ja
 
-    ted_corpus: List[str] = (
-        [d["ja"].rstrip() for d in ted_dataset_2014["train"]["translation"]]
-        + [d["ja"].rstrip() for d in ted_dataset_2015["train"]["translation"]]
-        + [d["ja"].rstrip() for d in ted_dataset_2016["train"]["translation"]]
-        + [d["ja"].rstrip() for d in ted_dataset_2017jaen["train"]["translation"]]
-    )
 
-    return ted_corpus
+def get_ted_corpus(cache_dir: Path = Path("data/cache/ted")) -> List[str]:
+    """Download and combine TED talk transcripts from multiple years.
+
+    Downloads Japanese transcripts from TED talks using the datasets library,
+    combining data from 2014-2017. The years are loaded concurrently and the
+    Japanese side of each is cached in `cache_dir` as an Arrow file, which
+    later calls read instead of loading the dataset again. Delete the cache
+    directory to load the datasets anew.
+
+    Args:
+        cache_dir: Directory of the cached Japanese sentences of each year
+
+    Returns:
+        List of Japanese sentences from TED talks, stripped of whitespace
+    """
+    logger.info("Loading TED corpus...")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=len(TED_DATASETS)) as executor:
+        columns = list(
+            executor.map(
+                lambda dataset: load_ted_dataset(*dataset, cache_dir), TED_DATASETS
+            )
+        )
+    return [sentence.rstrip() for column in columns for sentence in column.to_pylist()]
 
 
-def save_corpus(data_dir: Path, corpus_name: str, corpus: List[str]) -> None:
+def save_corpus(data_dir: Path, corpus_name: str, corpus: Iterable[str]) -> int:
     """Save a corpus to a file using standard naming convention.
 
+    Lines are written as they are produced, so the corpus can be a stream. A
+    line-offset index is written next to the file for `CorpusReader`.
+
     Args:
         data_dir: Directory to save the corpus file
         corpus_name: Name of the corpus (e.g., 'jnlp', 'ted')
-        corpus: List of corpus lines to save (assumed to not have newline at end)
+        corpus: Corpus lines to save (assumed to not have newline at end)
+
+    Returns:
+        Number of lines written
     """
     output_file = data_dir / f"{corpus_name}-corpus.txt"
+    n_lines = 0
     with open(output_file, "w", encoding="utf-8") as f:
         for line in corpus:
             f.write(f"{line}\n")
-    logger.info(f"Sampled {corpus_name} corpus saved to {output_file}")
+            n_lines += 1
+    write_line_index(output_file)
+    logger.info(f"{corpus_name} corpus saved to {output_file}")
+    return n_lines
 
 
 def save_corpora(data_dir: Path, corpora: dict[str, List[str]]) -> None:
@@ -257,7 +586,8 @@ def save_corpora(data_dir: Path, corpora: dict[str, List[str]]) -> None:
 def prepare_ted_corpus(data_dir: Path) -> int:
     """Prepare the TED corpus by downloading and saving to file.
 
-    Downloads the TED corpus and saves it to a single text file.
+    Downloads the TED corpus, or reads it from `{data_dir}/cache/ted`, and
+    saves it to a single text file.
 
     Args:
         data_dir: Directory where the corpus will be saved
@@ -265,58 +595,72 @@ def prepare_ted_corpus(data_dir: Path) -> int:
     Returns:
         Number of sentences in the corpus
     """
-    ted_corpus = get_ted_corpus()
+    ted_corpus = get_ted_corpus(data_dir / "cache" / "ted")
     save_corpus(data_dir, "ted", ted_corpus)
     return len(ted_corpus)
 
 
-def prepare_corpora(data_dir: Path) -> Tuple[int, int]:
+def prepare_corpora(data_dir: Path, workers: int = 1) -> Tuple[int, int]:
     """Prepare both JNLP and TED corpora.
 
     Creates the data directory if needed and prepares both corpora.
 
     Args:
         data_dir: Directory for storing both corpora
+        workers: Number of workers used to convert and filter the JNLP corpus
+            (default: 1)
 
     Returns:
         Tuple of (JNLP corpus size, TED corpus size)
     """
     data_dir.mkdir(parents=True, exist_ok=True)
-    jnlp_count = prepare_jnlp_corpus(data_dir)
+    jnlp_count = prepare_jnlp_corpus(data_dir, workers)
     ted_count = prepare_ted_corpus(data_dir)
     return jnlp_count, ted_count
 
 
-def load_corpus(data_dir: Path, corpus_name: str, sample_size: int) -> List[str]:
+def load_corpus(
+    data_dir: Path, corpus_name: str, sample_size: int, seed: Optional[int] = None
+) -> List[str]:
     """Load and sample from a prepared corpus.
 
+    Only the sampled lines are read, located through the line-offset index
+    written by `save_corpus`, which is built in one pass over the corpus if it
+    is missing or stale. Memory use therefore depends on `sample_size` and not
+    on the size of the corpus, and the sample is reproducible given `seed`.
+
     Args:
         data_dir: Directory containing the corpus files
         corpus_name: Name of the corpus ('jnlp' or 'ted')
         sample_size: Number of lines to randomly sample
+        seed: Random seed of the sample (default: draw from the `random` module)
 
     Returns:
-        List of sampled lines from the corpus
+        List of sampled lines from the corpus, without line endings
 
     Examples:
-        >>> from io import StringIO
-        >>> from unittest.mock import patch
-        >>> test_data = StringIO("line1\\nline2\\nline3\\nline4\\nline5")
-        >>> with patch('builtins.open', return_value=test_data):
-        ...     lines = load_corpus(Path("."), "test", 3)
-        ...     len(lines)
-        3
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     corpus_file = Path(d) / "test-corpus.txt"
+        ...     _ = corpus_file.write_bytes(b"line1\\nline2\\r\\nline3\\nline4\\nline5")
+        ...     sample = load_corpus(Path(d), "test", 3, seed=0)
+        ...     corpus_file.with_name("test-corpus.txt.offsets.npy").unlink()
+        ...     len(sample), sample == load_corpus(Path(d), "test", 3, seed=0)
+        ...     sorted(load_corpus(Path(d), "test", 10))
+        (3, True)
+        ['line1', 'line2', 'line3', 'line4', 'line5']
     """
     corpus_file = data_dir / f"{corpus_name}-corpus.txt"
-    with open(corpus_file, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    random.shuffle(lines)
-    return lines[:sample_size]
+    rng = random.Random(seed) if seed is not None else None
+    with CorpusReader(corpus_file) as reader:
+        return reader.sample(sample_size, rng)
 
 
 def load_corpora(
-    data_dir: Path, jnlp_sample_size: int = 3000, ted_sample_size: int = 30000
+    data_dir: Path,
+    jnlp_sample_size: int = 3000,
+    ted_sample_size: int = 30000,
+    seed: Optional[int] = None,
 ) -> Tuple[List[str], List[str]]:
     """Load and sample from both JNLP and TED corpora.
 
@@ -324,12 +668,13 @@ def load_corpora(
         data_dir: Directory containing the corpus files
         jnlp_sample_size: Number of lines to sample from JNLP corpus
         ted_sample_size: Number of lines to sample from TED corpus
+        seed: Random seed of the samples (default: draw from the `random` module)
 
     Returns:
         Tuple of (JNLP corpus samples, TED corpus samples)
     """
-    jnlp_corpus = load_corpus(data_dir, "jnlp", jnlp_sample_size)
-    ted_corpus = load_corpus(data_dir, "ted", ted_sample_size)
+    jnlp_corpus = load_corpus(data_dir, "jnlp", jnlp_sample_size, seed)
+    ted_corpus = load_corpus(data_dir, "ted", ted_sample_size, seed)
     return jnlp_corpus, ted_corpus
 
 
@@ -372,24 +717,42 @@ if __name__ == "__main__":
         default=Path("data"),
         help="Directory to store or load the prepared corpora (default: './data').",
     )
+    parser.add_argument(
+        "--show",
+        nargs=2,
+        metavar=("CORPUS", "LINE"),
+        help="Print line number LINE (from 0) of a prepared corpus, e.g. '--show ted 123'.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of workers used to convert and filter the JNLP corpus (default: number of CPUs).",
+    )
     args = parser.parse_args()
 
     set_random_seed(args.seed)
     logger.info(f"Random seed set to {args.seed}")
 
-    if not (args.prepare or args.load):
+    if args.show:
+        corpus_name, line_number = args.show
+        with CorpusReader(args.data_dir / f"{corpus_name}-corpus.txt") as reader:
+            print(reader[int(line_number)])
+    elif not (args.prepare or args.load):
         parser.print_help()
-        print("\nNo action specified. Use --prepare or --load to perform operations.")
+        print(
+            "\nNo action specified. Use --prepare, --load or --show to perform operations."
+        )
     else:
         if args.prepare:
-            jnlp_count, ted_count = prepare_corpora(args.data_dir)
+            jnlp_count, ted_count = prepare_corpora(args.data_dir, args.workers)
             logger.info(f"Corpora prepared and saved in {args.data_dir}")
             logger.info(f"JNLP corpus: {jnlp_count} sentences/paragraphs prepared")
             logger.info(f"TED corpus: {ted_count} sentences/paragraphs prepared")
 
         if args.load:
             jnlp_corpus, ted_corpus = load_corpora(
-                args.data_dir, args.jnlp_sample_size, args.ted_sample_size
+                args.data_dir, args.jnlp_sample_size, args.ted_sample_size, args.seed
             )
             logger.info(
                 f"Loaded {len(jnlp_corpus)} sentences from JNLP corpus (sample size: {args.jnlp_sample_size})"
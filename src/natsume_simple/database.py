@@ -0,0 +1,583 @@
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import polars as pl  # type: ignore
+
+from natsume_simple.log import setup_logger
+
+try:
+    import pyarrow as pa  # type: ignore
+except ImportError:  # pragma: no cover
+    pa = None
+
+logger = setup_logger(__name__)
+
+# Extraction results are named {corpus}_npvs_{model} with a result suffix.
+RESULT_PATTERN = re.compile(
+    r"^(?P<corpus>.+)_npvs_(?P<model>.+)\.(?:csv|parquet|arrow)$"
+)
+DATABASE_PATTERN = re.compile(r"^npvs_(?P<model>.+)\.arrow$")
+
+
+def discover_datasets(data_dir: Path = Path("data")) -> Dict[str, List[str]]:
+    """Find the models with extraction results or a database file in a directory.
+
+    Args:
+        data_dir: Directory containing the extraction results
+
+    Returns:
+        Dictionary mapping every model name to the sorted names of the corpora
+        it has results for
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     for name in ["ted_npvs_ja_ginza.csv", "jnlp_npvs_ja_ginza.parquet",
+        ...                  "ted_npvs_ja_ginza_electra.csv", "npvs_ja_ginza.arrow",
+        ...                  "ted_corpus.txt", "ted_npvs_ja_ginza.csv.partial"]:
+        ...         _ = (Path(d) / name).write_text("")
+        ...     discover_datasets(Path(d))
+        {'ja_ginza': ['jnlp', 'ted'], 'ja_ginza_electra': ['ted']}
+    """
+    datasets: Dict[str, set] = {}
+    if data_dir.is_dir():
+        for path in data_dir.iterdir():
+            if match := RESULT_PATTERN.match(path.name):
+                datasets.setdefault(match["model"], set()).add(match["corpus"])
+            elif match := DATABASE_PATTERN.match(path.name):
+                datasets.setdefault(match["model"], set())
+    return {model: sorted(corpora) for model, corpora in sorted(datasets.items())}
+
+
+def read_results(stem: str) -> pl.DataFrame:
+    """Read extraction results, preferring columnar files over CSV.
+
+    Args:
+        stem: Path of the results without suffix, e.g. 'data/ted_npvs_ja_ginza'
+
+    Returns:
+        DataFrame with string n, p, v and corpus columns and a frequency column,
+        which is 1 for every row of non-aggregated results
+    """
+    for suffix, read in (
+        (".parquet", pl.read_parquet),
+        (".arrow", pl.read_ipc),
+        (".csv", pl.read_csv),
+    ):
+        path = Path(stem + suffix)
+        if path.is_file():
+            df = read(path)
+            break
+    else:
+        raise FileNotFoundError(f"No results found for {stem}")
+
+    if "frequency" not in df.columns:
+        df = df.with_columns(pl.lit(1, dtype=pl.UInt32).alias("frequency"))
+    return df.with_columns(pl.col("n", "p", "v", "corpus").cast(pl.String))
+
+
+def load_database(model_name: str, data_dir: Path = Path("data")) -> pl.DataFrame:
+    """Load and aggregate the extraction results of all corpora for a model.
+
+    Args:
+        model_name: Name of the spaCy model used for extraction
+        data_dir: Directory containing the extraction results
+
+    Returns:
+        DataFrame with one row per distinct (n, p, v, corpus) and its frequency
+    """
+    corpora = discover_datasets(data_dir).get(model_name)
+    if not corpora:
+        raise FileNotFoundError(f"No results found for {model_name} in {data_dir}")
+    db = pl.concat(
+        [read_results(f"{data_dir}/{corpus}_npvs_{model_name}") for corpus in corpora]
+    )
+    return db.group_by("n", "p", "v", "corpus").agg(pl.col("frequency").sum())
+
+
+def calculate_corpus_norm(db: pl.DataFrame) -> Dict[str, float]:
+    """Calculate normalization factors for different corpora.
+
+    Args:
+        db: DataFrame containing corpus frequencies
+
+    Returns:
+        Dictionary mapping corpus names to their normalization factors
+
+    Examples:
+        >>> import polars as pl
+        >>> df = pl.DataFrame({
+        ...     "corpus": ["ted", "ted", "jnlp", "jnlp", "jnlp"],
+        ...     "frequency": [1, 2, 3, 2, 1]
+        ... })
+        >>> norms = calculate_corpus_norm(df)
+        >>> norms["ted"] == 1.0  # ted has lower total frequency
+        True
+        >>> norms["jnlp"] == 0.5  # jnlp has double the frequency
+        True
+    """
+    corpus_freqs = dict(
+        db.group_by("corpus").agg(pl.col("frequency").sum()).iter_rows()
+    )
+    min_count = min(corpus_freqs.values())
+    return {corpus: min_count / frequency for corpus, frequency in corpus_freqs.items()}
+
+
+class NPVIndex:
+    """Index of the aggregated table answering noun and verb lookups.
+
+    The table is kept in two copies, one sorted by noun and one by verb, so
+    the rows of a key form a contiguous range that is found by binary search
+    in O(log n) and returned as a zero-copy slice.
+
+    Examples:
+        >>> df = pl.DataFrame({
+        ...     "n": ["本", "彼", "本"],
+        ...     "p": ["を", "に", "を"],
+        ...     "v": ["読む", "会う", "書く"],
+        ...     "corpus": ["ted", "ted", "jnlp"],
+        ...     "frequency": [3, 1, 2],
+        ... })
+        >>> index = NPVIndex.from_table(df)
+        >>> index.noun("本")["v"].to_list()
+        ['書く', '読む']
+        >>> index.verb("会う")["n"].to_list()
+        ['彼']
+        >>> index.noun("猫").height
+        0
+    """
+
+    def __init__(
+        self, by_noun: pl.DataFrame, by_verb: pl.DataFrame, mapped: bool = False
+    ):
+        """Wrap tables already sorted by noun and by verb, respectively.
+
+        `mapped` tells that the tables are memory mapped from a file rather
+        than held on the heap.
+        """
+        self.by_noun = by_noun
+        self.by_verb = by_verb
+        self.mapped = mapped
+
+    @classmethod
+    def from_table(cls, db: pl.DataFrame) -> "NPVIndex":
+        """Build the index by sorting the aggregated table."""
+        return cls(db.sort("n", "p", "v", "corpus"), db.sort("v", "p", "n", "corpus"))
+
+    @property
+    def table(self) -> pl.DataFrame:
+        """The whole aggregated table."""
+        return self.by_noun
+
+    def heap_size(self) -> int:
+        """Return the approximate number of heap bytes held by the tables.
+
+        Memory-mapped tables live in the page cache, which the kernel reclaims
+        and shares between processes, so they count as 0.
+        """
+        if self.mapped:
+            return 0
+        return self.by_noun.estimated_size() + self.by_verb.estimated_size()
+
+    @staticmethod
+    def _lookup(df: pl.DataFrame, column: str, key: str) -> pl.DataFrame:
+        keys = df[column]
+        start = keys.search_sorted(key, "left")
+        end = keys.search_sorted(key, "right")
+        return df.slice(start, end - start)  # type: ignore
+
+    def noun(self, noun: str) -> pl.DataFrame:
+        """Return the rows whose noun is `noun`."""
+        return self._lookup(self.by_noun, "n", noun)
+
+    def verb(self, verb: str) -> pl.DataFrame:
+        """Return the rows whose verb is `verb`."""
+        return self._lookup(self.by_verb, "v", verb)
+
+
+def select_rows(
+    df: pl.DataFrame,
+    corpus_norm: Dict[str, float],
+    limit: Optional[int] = None,
+    offset: int = 0,
+    min_frequency: int = 1,
+    particle: Optional[str] = None,
+    corpora: Optional[Sequence[str]] = None,
+) -> pl.DataFrame:
+    """Filter the rows of a lookup and page through them by normalized frequency.
+
+    Rows are kept if their frequency is at least `min_frequency` and they match
+    `particle` and `corpora`, when given. With a `limit` or `offset`, the rows
+    are ranked by frequency times the normalization factor of their corpus,
+    ties broken by (p, n, v, corpus), and only the requested page is selected,
+    using a partial top-k selection when a `limit` is given. Otherwise the rows
+    keep their order.
+
+    Args:
+        df: Rows of a noun or verb lookup
+        corpus_norm: Normalization factor of every corpus
+        limit: Maximum number of rows to return
+        offset: Number of top-ranked rows to skip
+        min_frequency: Minimum raw frequency of a row
+        particle: Particle the rows must have
+        corpora: Corpora the rows must come from
+
+    Returns:
+        DataFrame with the selected rows
+
+    Examples:
+        >>> df = pl.DataFrame({
+        ...     "n": ["本", "本", "本", "本"],
+        ...     "p": ["を", "を", "に", "を"],
+        ...     "v": ["読む", "読む", "書く", "買う"],
+        ...     "corpus": ["ted", "jnlp", "ted", "ted"],
+        ...     "frequency": [3, 4, 2, 1],
+        ... })
+        >>> norms = {"ted": 1.0, "jnlp": 0.5}
+        >>> select_rows(df, norms, limit=2).select("v", "corpus").rows()
+        [('読む', 'ted'), ('書く', 'ted')]
+        >>> select_rows(df, norms, limit=2, offset=1)["frequency"].to_list()
+        [2, 4]
+        >>> select_rows(df, norms, particle="を", corpora=["ted"])["v"].to_list()
+        ['読む', '買う']
+        >>> select_rows(df, norms, min_frequency=3).height
+        2
+    """
+    filters = []
+    if min_frequency > 1:
+        filters.append(pl.col("frequency") >= min_frequency)
+    if particle is not None:
+        filters.append(pl.col("p") == particle)
+    if corpora:
+        filters.append(pl.col("corpus").is_in(list(corpora)))
+    if filters:
+        df = df.filter(filters)
+    if limit is None and offset == 0:
+        return df
+
+    score = pl.col("frequency") * pl.col("corpus").replace_strict(
+        corpus_norm, default=1.0, return_dtype=pl.Float64
+    )
+    by = [score, "p", "n", "v", "corpus"]
+    if limit is not None:
+        df = df.top_k(offset + limit, by=by, reverse=[False, True, True, True, True])
+    return df.sort(by, descending=[True, False, False, False, False]).slice(
+        offset, limit
+    )
+
+
+class SearchIndex:
+    """Index of the distinct nouns and verbs answering substring queries.
+
+    The terms of each part of speech are numbered in order of decreasing total
+    frequency, and every character and character bigram maps to the ascending
+    list of numbers of the terms containing it. A query walks the shortest of
+    the lists of its bigrams, so the first `limit` terms that contain the query
+    are its most frequent matches and the walk stops there, never touching the
+    main table.
+
+    Examples:
+        >>> df = pl.DataFrame({
+        ...     "n": ["日本", "本", "本", "本当"],
+        ...     "p": ["に", "を", "を", "に"],
+        ...     "v": ["行く", "読む", "書く", "驚く"],
+        ...     "corpus": ["ted", "ted", "jnlp", "ted"],
+        ...     "frequency": [1, 3, 2, 4],
+        ... })
+        >>> search = SearchIndex.from_table(df)
+        >>> search.search("本")
+        [('本', 'n'), ('本当', 'n'), ('日本', 'n')]
+        >>> search.search("く", limit=2)
+        [('驚く', 'v'), ('書く', 'v')]
+        >>> search.search("本当", limit=1)
+        [('本当', 'n')]
+        >>> search.search("猫")
+        []
+    """
+
+    def __init__(self, terms: Dict[str, List[Tuple[str, int]]]):
+        """Index terms given per part of speech as (term, frequency) pairs."""
+        self.terms: Dict[str, List[str]] = {}
+        self.frequencies: Dict[str, List[int]] = {}
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        for pos, pairs in terms.items():
+            pairs = sorted(pairs, key=lambda pair: (-pair[1], pair[0]))
+            self.terms[pos] = [term for term, _ in pairs]
+            self.frequencies[pos] = [frequency for _, frequency in pairs]
+            postings: Dict[str, List[int]] = {}
+            for i, term in enumerate(self.terms[pos]):
+                for gram in self._grams(term):
+                    postings.setdefault(gram, []).append(i)
+            self.postings[pos] = postings
+
+    def estimated_size(self) -> int:
+        """Return the approximate number of bytes held by the index."""
+        size = 0
+        for pos, terms in self.terms.items():
+            # Every term has an int object for its number and one for its frequency.
+            size += sum(sys.getsizeof(term) + 64 for term in terms)
+            size += sys.getsizeof(terms) + sys.getsizeof(self.frequencies[pos])
+            size += sum(
+                sys.getsizeof(gram) + sys.getsizeof(postings)
+                for gram, postings in self.postings[pos].items()
+            )
+        return size
+
+    @classmethod
+    def from_table(cls, db: pl.DataFrame) -> "SearchIndex":
+        """Build the index from the total frequencies of nouns and verbs."""
+        return cls(
+            {
+                pos: db.group_by(pos).agg(pl.col("frequency").sum()).rows()
+                for pos in ("n", "v")
+            }
+        )
+
+    @staticmethod
+    def _grams(text: str) -> set:
+        return set(text) | {text[i : i + 2] for i in range(len(text) - 1)}
+
+    def _search_pos(self, query: str, pos: str, limit: int) -> List[int]:
+        terms = self.terms[pos]
+        if len(query) == 1:
+            return self.postings[pos].get(query, [])[:limit]
+        candidates = min(
+            (
+                self.postings[pos].get(query[i : i + 2], [])
+                for i in range(len(query) - 1)
+            ),
+            key=len,
+        )
+        if len(query) == 2:
+            return candidates[:limit]
+        found: List[int] = []
+        for i in candidates:
+            if query in terms[i]:
+                found.append(i)
+                if len(found) == limit:
+                    break
+        return found
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """Return the most frequent nouns and verbs containing `query`.
+
+        Args:
+            query: Substring to search for
+            limit: Maximum number of nouns, and of verbs, to return
+
+        Returns:
+            Up to `limit` nouns and `limit` verbs as (term, 'n' or 'v') pairs,
+            ordered by decreasing frequency
+        """
+        if not query:
+            return []
+        matches = [
+            (self.frequencies[pos][i], self.terms[pos][i], pos)
+            for pos in self.terms
+            for i in self._search_pos(query, pos, limit)
+        ]
+        matches.sort(key=lambda match: -match[0])
+        return [(term, pos) for _, term, pos in matches]
+
+
+def database_path(model_name: str, data_dir: Path = Path("data")) -> Path:
+    """Return the path of the prebuilt database file of a model."""
+    return data_dir / f"npvs_{model_name}.arrow"
+
+
+def result_files(model_name: str, data_dir: Path = Path("data")) -> List[Path]:
+    """Return the extraction result files of a model, sorted by name."""
+    return sorted(
+        path
+        for path in data_dir.glob(f"*_npvs_{model_name}.*")
+        if (match := RESULT_PATTERN.match(path.name)) and match["model"] == model_name
+    )
+
+
+def database_is_current(model_name: str, data_dir: Path = Path("data")) -> bool:
+    """Return whether the prebuilt database file is at least as new as every result file.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     db_file = database_path("m", Path(d))
+        ...     _ = db_file.write_text("")
+        ...     _ = (Path(d) / "ted_npvs_m.csv").write_text("")
+        ...     os.utime(db_file, ns=(0, 0))
+        ...     database_is_current("m", Path(d))
+        ...     os.utime(db_file)
+        ...     database_is_current("m", Path(d))
+        False
+        True
+    """
+    db_mtime = database_path(model_name, data_dir).stat().st_mtime_ns
+    return all(
+        path.stat().st_mtime_ns <= db_mtime
+        for path in result_files(model_name, data_dir)
+    )
+
+
+def build_database(model_name: str, data_dir: Path = Path("data")) -> Path:
+    """Aggregate the extraction results of a model into one Arrow IPC file.
+
+    The file holds the aggregated table twice, first sorted by noun and then
+    sorted by verb, as used by `NPVIndex`. It is uncompressed so that it can be
+    memory mapped, and stores the number of rows of each copy and the corpus
+    normalization factors in its schema metadata.
+
+    Args:
+        model_name: Name of the spaCy model used for extraction
+        data_dir: Directory containing the extraction results
+
+    Returns:
+        Path of the written database file
+    """
+    if pa is None:
+        raise RuntimeError("Building the database file requires pyarrow.")
+
+    db = load_database(model_name, data_dir)
+    corpus_norm = calculate_corpus_norm(db)
+    index = NPVIndex.from_table(db)
+    table = pl.concat([index.by_noun, index.by_verb]).to_arrow(
+        compat_level=pl.CompatLevel.newest()
+    )
+    table = table.replace_schema_metadata(
+        {"corpus_norm": json.dumps(corpus_norm), "rows": str(db.height)}
+    )
+
+    output_file = database_path(model_name, data_dir)
+    tmp_file = output_file.with_name(output_file.name + ".tmp")
+    with pa.OSFile(str(tmp_file), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_file, output_file)
+    return output_file
+
+
+def open_database(
+    model_name: str, data_dir: Path = Path("data")
+) -> Tuple[NPVIndex, Dict[str, float]]:
+    """Open the database of a model, memory mapping the prebuilt file if present.
+
+    A memory-mapped table is not copied onto the heap, so server workers
+    opening the same file share it through the page cache, and its sorted
+    copies are used for the index as is. Without a prebuilt file, without
+    pyarrow, or if a result file is newer than the prebuilt file, the
+    extraction results are loaded, aggregated and sorted.
+
+    Args:
+        model_name: Name of the spaCy model used for extraction
+        data_dir: Directory containing the database file or extraction results
+
+    Returns:
+        Tuple of the indexed table and the corpus normalization factors
+    """
+    db_file = database_path(model_name, data_dir)
+    if db_file.is_file() and not database_is_current(model_name, data_dir):
+        logger.warning(
+            f"{db_file} is older than the extraction results of {model_name}, "
+            "loading the results instead; rebuild it with database.py."
+        )
+    elif db_file.is_file() and pa is not None:
+        reader = pa.ipc.open_file(pa.memory_map(str(db_file)))
+        table = pl.from_arrow(reader.read_all(), rechunk=False)
+        metadata = reader.schema.metadata
+        rows = int(metadata[b"rows"])
+        index = NPVIndex(
+            table.slice(0, rows),  # type: ignore
+            table.slice(rows, rows),  # type: ignore
+            mapped=True,
+        )
+        return index, json.loads(metadata[b"corpus_norm"])
+
+    db = load_database(model_name, data_dir)
+    return NPVIndex.from_table(db), calculate_corpus_norm(db)
+
+
+class Snapshot(NamedTuple):
+    """Everything the server needs to answer queries on the data of one model.
+
+    A snapshot is never modified, so a new one can be built while the current
+    one keeps serving, and replacing the reference swaps them atomically.
+    """
+
+    model_name: str
+    index: NPVIndex
+    corpus_norm: Dict[str, float]
+    search_index: SearchIndex
+    version: Tuple[Tuple[str, int, int], ...]
+
+
+def snapshot_size(snapshot: Snapshot) -> int:
+    """Return the approximate number of heap bytes held by a snapshot.
+
+    Tables memory mapped from a prebuilt database file are not counted, only
+    the search index and tables loaded from the extraction results.
+    """
+    return snapshot.index.heap_size() + snapshot.search_index.estimated_size()
+
+
+def source_version(
+    model_name: str, data_dir: Path = Path("data")
+) -> Tuple[Tuple[str, int, int], ...]:
+    """Return the name, modification time and size of the files a model is loaded from.
+
+    The value changes whenever the database file or an extraction result of
+    the model is written, so it identifies the data a snapshot was built from.
+    """
+    candidates = [
+        database_path(model_name, data_dir),
+        *result_files(model_name, data_dir),
+    ]
+    version = []
+    for path in candidates:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        version.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def load_snapshot(model_name: str, data_dir: Path = Path("data")) -> Snapshot:
+    """Open the database of a model and build its search index.
+
+    Args:
+        model_name: Name of the spaCy model used for extraction
+        data_dir: Directory containing the database file or extraction results
+
+    Returns:
+        Snapshot of the data of the model
+    """
+    version = source_version(model_name, data_dir)
+    index, corpus_norm = open_database(model_name, data_dir)
+    return Snapshot(
+        model_name, index, corpus_norm, SearchIndex.from_table(index.table), version
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the memory-mappable NPV database file used by the server."
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="ja_ginza_bert_large",
+        help="Name of the spaCy model used for extraction (default: ja_ginza_bert_large)",
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path("data"),
+        help="Directory containing the extraction results (default: ./data)",
+    )
+    args = parser.parse_args()
+
+    output_file = build_database(args.model, args.data_dir)
+    logger.info(f"Database saved to {output_file}")
@@ -0,0 +1,273 @@
+import cProfile
+import json
+import resource
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import (
+    Any,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+from natsume_simple.log import setup_logger
+
+logger = setup_logger(__name__)
+
+# The run recorded into, set by `recording`. While it is None, the helpers
+# called by the extraction code return at once.
+current: Optional["Instrumentation"] = None
+
+NO_STAGE: ContextManager = nullcontext()
+
+
+def peak_rss_mib(who: int = resource.RUSAGE_SELF) -> float:
+    """Return the peak resident set size of this process, or of its ended children, in MiB."""
+    rss = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / (1 << 10)
+
+
+def timed(items: Iterable[Any], totals: Dict[str, float], name: str) -> Iterator[Any]:
+    """
+    Yield the items of an iterable, adding the time spent producing them to `totals[name]`.
+
+    Examples:
+        >>> totals = {}
+        >>> list(timed(range(3), totals, "range")), totals["range"] >= 0
+        ([0, 1, 2], True)
+    """
+    totals.setdefault(name, 0.0)
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            totals[name] += time.perf_counter() - start
+            return
+        totals[name] += time.perf_counter() - start
+        yield item
+
+
+class Instrumentation:
+    """Stage and component timings, counters and throughput of an extraction run.
+
+    The extraction code records into the instance made `current` by
+    `recording`: the time of each stage (parse, match, cache, write), the
+    time of each spaCy pipeline component, counters such as verb phrases
+    that failed to normalize, and the lines and patterns written so far after
+    every written batch. `report` summarizes them with the peak memory.
+
+    Examples:
+        >>> run = Instrumentation({"model": "ja_ginza"})
+        >>> with run.stage("match"):
+        ...     pass
+        >>> run.count("normalize_failures")
+        >>> run.progress(10, 3)
+        >>> report = run.report()
+        >>> report["model"], list(report["stages"]), report["counts"]
+        ('ja_ginza', ['match'], {'normalize_failures': 1})
+        >>> report["lines"], report["patterns"], len(report["throughput"])
+        (10, 3, 1)
+    """
+
+    def __init__(self, info: Optional[Dict[str, Any]] = None):
+        """
+        Start recording a run.
+
+        Args:
+            info (Optional[Dict[str, Any]]): Description of the run, e.g. the
+                model and input, copied to the report.
+        """
+        self.info = dict(info or {})
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.components: Dict[str, float] = defaultdict(float)
+        self.counts: Counter[str] = Counter()
+        self.throughput: List[Dict[str, float]] = []
+        self.n_lines = self.n_results = 0
+        self.shards: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the time spent in the block to stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add `n` to counter `name`."""
+        self.counts[name] += n
+
+    def progress(self, n_lines: int, n_results: int) -> None:
+        """Record the number of lines processed and patterns written so far."""
+        self.n_lines, self.n_results = n_lines, n_results
+        self.throughput.append(
+            {
+                "seconds": round(time.perf_counter() - self.start, 3),
+                "lines": n_lines,
+                "patterns": n_results,
+            }
+        )
+
+    def pipe(self, nlp: Any, texts: Sequence[str], batch_size: int) -> List[Any]:
+        """
+        Parse texts like `nlp.pipe`, timing each pipeline component.
+
+        spaCy has no hook around its components, so they are chained here as
+        `Language.pipe` does: the tokenizer, then the `pipe` method of every
+        component, or the component itself for those without one. The docs
+        are identical to those of `nlp.pipe`. As the components are lazy
+        generators, pulling a doc out of one also runs the components before
+        it, so the time of each is its total less that of its predecessor.
+
+        Args:
+            nlp (spacy.language.Language): The loaded NLP model.
+            texts (Sequence[str]): The texts to parse.
+            batch_size (int): Batch size passed to the components.
+
+        Returns:
+            List[Doc]: The doc of each text.
+
+        Examples:
+            >>> import spacy
+            >>> nlp = spacy.load("ja_ginza")
+            >>> texts = ["本を読む。", "彼に会った。"]
+            >>> run = Instrumentation()
+            >>> [doc.to_json() for doc in run.pipe(nlp, texts, 2)] == [
+            ...     doc.to_json() for doc in nlp.pipe(texts)]
+            True
+            >>> list(run.components) == ["tokenizer", *nlp.pipe_names]
+            True
+        """
+        # In pipeline order, as the generators only start when pulled from.
+        totals = dict.fromkeys(["tokenizer", *nlp.pipe_names], 0.0)
+        docs = timed(map(nlp.make_doc, texts), totals, "tokenizer")
+        for name, proc in nlp.pipeline:
+            if hasattr(proc, "pipe"):
+                docs = proc.pipe(docs, batch_size=batch_size)
+            else:
+                docs = map(proc, docs)
+            docs = timed(docs, totals, name)
+        parsed = list(docs)
+        previous = 0.0
+        for name, seconds in totals.items():
+            self.components[name] += seconds - previous
+            previous = seconds
+        return parsed
+
+    def add_shard(self, report: Dict[str, Any]) -> None:
+        """
+        Add the report of a shard processed in a worker process.
+
+        Its stage and component times and counters are added to this run's,
+        and the report is kept as is under `shards`.
+        """
+        for name, seconds in report["stages"].items():
+            self.stages[name] += seconds
+        for name, seconds in report["components"].items():
+            self.components[name] += seconds
+        self.counts.update(report["counts"])
+        self.shards.append(report)
+
+    def report(self) -> Dict[str, Any]:
+        """Return the recorded run as a JSON-serializable dict."""
+        seconds = time.perf_counter() - self.start
+        return {
+            **self.info,
+            "seconds": round(seconds, 3),
+            "lines": self.n_lines,
+            "patterns": self.n_results,
+            "lines_per_second": round(self.n_lines / seconds, 2) if seconds else 0,
+            "patterns_per_second": round(self.n_results / seconds, 2) if seconds else 0,
+            "peak_rss_mib": round(peak_rss_mib(), 1),
+            "peak_rss_mib_children": round(peak_rss_mib(resource.RUSAGE_CHILDREN), 1),
+            "stages": {name: round(s, 3) for name, s in self.stages.items()},
+            "components": {name: round(s, 3) for name, s in self.components.items()},
+            "counts": dict(self.counts),
+            "throughput": self.throughput,
+            "shards": self.shards,
+        }
+
+    def write_report(self, report_file: Path) -> None:
+        """Write the report as JSON to `report_file`."""
+        report_file.write_text(
+            json.dumps(self.report(), ensure_ascii=False, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        logger.info(f"Instrumentation report saved to {report_file}")
+
+
+@contextmanager
+def recording(
+    run: Optional[Instrumentation], profile_file: Optional[Path] = None
+) -> Iterator[Optional[Instrumentation]]:
+    """
+    Make `run` the current run for the enclosed block, and optionally profile it.
+
+    With `profile_file`, the block runs under cProfile and the stats are
+    dumped to it on exit, for `python -m pstats`, snakeviz or gprof2dot.
+
+    Args:
+        run (Optional[Instrumentation]): The run to record into, or None to
+            record nothing.
+        profile_file (Optional[Path]): File to dump the cProfile stats to.
+
+    Yields:
+        Optional[Instrumentation]: `run`.
+
+    Examples:
+        >>> run = Instrumentation()
+        >>> with recording(run):
+        ...     with stage("write"):
+        ...         pass
+        >>> list(run.stages), current is None
+        (['write'], True)
+    """
+    global current
+    previous, current = current, run
+    profiler = cProfile.Profile() if profile_file else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield run
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            logger.info(f"Profile saved to {profile_file}")
+        current = previous
+
+
+def stage(name: str) -> ContextManager:
+    """Return a context timing stage `name` of the current run, if any."""
+    return current.stage(name) if current else NO_STAGE
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add `n` to counter `name` of the current run, if any."""
+    if current:
+        current.count(name, n)
+
+
+def progress(n_lines: int, n_results: int) -> None:
+    """Record the progress of the current run, if any."""
+    if current:
+        current.progress(n_lines, n_results)
+
+
+def pipe(nlp: Any, texts: Sequence[str], batch_size: int) -> Iterable[Any]:
+    """Parse texts with `nlp.pipe`, or component by component if a run is recorded."""
+    if current:
+        return current.pipe(nlp, texts, batch_size)
+    return nlp.pipe(texts, batch_size=batch_size)
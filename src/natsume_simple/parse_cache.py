@@ -0,0 +1,185 @@
+import hashlib
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable
+
+from natsume_simple.log import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ParseCache:
+    """On-disk, content-addressed cache of sentence parses and matcher output.
+
+    Entries are stored in a SQLite database under two levels: serialized spaCy
+    `DocBin` parses keyed by (sentence hash, model name, model version), and
+    matcher output keyed additionally by the extraction code version. When the
+    total size of the stored entries exceeds `max_bytes`, the least recently
+    used entries are evicted. The total is kept up to date by triggers in a
+    `meta` row, so checking it does not scan the entries.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     cache = ParseCache(Path(d), "ja_ginza", "5.2.0", "0.2.0", max_bytes=10)
+        ...     key = cache.doc_key("文")
+        ...     cache.put_many({key: b"12345678"})
+        ...     cache.get_many([key], "doc") == {key: b"12345678"}
+        ...     cache.put_many({cache.doc_key("別の文"): b"12345678"})
+        ...     cache.get_many([key], "doc")
+        ...     cache.stats["doc_hits"], cache.stats["doc_misses"]
+        ...     cache.put_many({key: b"1234"})
+        ...     cache.total_size()
+        ...     cache.close()
+        True
+        {}
+        (1, 1)
+        4
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        model_name: str,
+        model_version: str,
+        code_version: str,
+        max_bytes: int = 4 << 30,
+    ):
+        """
+        Open (or create) the cache database in `cache_dir`.
+
+        Args:
+            cache_dir (Path): Directory holding the cache database.
+            model_name (str): Name of the spaCy model whose parses are cached.
+            model_version (str): Version of the spaCy model.
+            code_version (str): Version of the extraction code producing matches.
+            max_bytes (int): Size cap of all stored entries.
+        """
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.model_version = model_version
+        self.code_version = code_version
+        self.max_bytes = max_bytes
+        self.stats: Counter[str] = Counter()
+        self.conn = sqlite3.connect(cache_dir / "parse-cache.sqlite3", timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, atime INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)")
+        self.conn.commit()
+        # Worker processes share the database, so the running total is kept in
+        # it. A cache created before the total was kept is summed once here.
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO meta SELECT 'total_size', COALESCE(SUM(size), 0) FROM entries"
+        )
+        for event, change in [
+            ("INSERT", "new.size"),
+            ("DELETE", "-old.size"),
+            ("UPDATE OF size", "new.size - old.size"),
+        ]:
+            name = event.split()[0].lower()
+            self.conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS entries_{name} AFTER {event} ON entries "
+                f"BEGIN UPDATE meta SET value = value + {change} WHERE key = 'total_size'; END"
+            )
+        self.conn.commit()
+
+    def _key(self, *parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def doc_key(self, sentence: str) -> str:
+        """Return the key of the parse of `sentence`."""
+        return self._key("doc", self.model_name, self.model_version, sentence)
+
+    def match_key(self, sentence: str) -> str:
+        """Return the key of the matcher output for `sentence`."""
+        return self._key(
+            "match", self.model_name, self.model_version, self.code_version, sentence
+        )
+
+    def get_many(self, keys: Iterable[str], level: str) -> Dict[str, bytes]:
+        """
+        Look up entries and mark the found ones as recently used.
+
+        Args:
+            keys (Iterable[str]): Keys to look up.
+            level (str): Cache level used for hit/miss counts ('doc' or 'match').
+
+        Returns:
+            Dict[str, bytes]: The found entries by key.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                self.conn.execute(
+                    f"SELECT key, data FROM entries WHERE key IN ({placeholders})",
+                    chunk,
+                )
+            )
+            self.conn.execute(
+                f"UPDATE entries SET atime = ? WHERE key IN ({placeholders})",
+                [time.time_ns(), *chunk],
+            )
+        self.conn.commit()
+        self.stats[f"{level}_hits"] += len(found)
+        self.stats[f"{level}_misses"] += len(keys) - len(found)
+        return found
+
+    def total_size(self) -> int:
+        """Return the total size of the stored entries."""
+        return self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'total_size'"
+        ).fetchone()[0]
+
+    def put_many(self, entries: Dict[str, bytes]) -> None:
+        """
+        Store entries, then evict least recently used entries over the size cap.
+
+        Args:
+            entries (Dict[str, bytes]): Entries to store by key.
+        """
+        now = time.time_ns()
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete would
+        # not fire the delete trigger.
+        self.conn.executemany(
+            "INSERT INTO entries VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE "
+            "SET data = excluded.data, size = excluded.size, atime = excluded.atime",
+            [(key, data, len(data), now) for key, data in entries.items()],
+        )
+        total = self.total_size()
+        if total > self.max_bytes:
+            evicted = []
+            for key, size in self.conn.execute(
+                "SELECT key, size FROM entries ORDER BY atime"
+            ):
+                if total <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                total -= size
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+            self.stats["evictions"] += len(evicted)
+        self.conn.commit()
+
+    def log_stats(self) -> None:
+        """Log hit/miss counts of both cache levels."""
+        s = self.stats
+        logger.info(
+            f"Parse cache: {s['match_hits']} match hits, {s['match_misses']} match misses, "
+            f"{s['doc_hits']} parse hits, {s['doc_misses']} parse misses, "
+            f"{s['evictions']} evictions."
+        )
+
+    def close(self) -> None:
+        """Close the cache database."""
+        self.conn.close()
@@ -1,39 +1,54 @@
 import argparse
+import functools
+import hashlib
+import importlib.metadata
+import json
+import multiprocessing
+import os
 import re
+import shutil
+import sys
+import time
 from collections.abc import Iterator
-from itertools import chain, takewhile, tee
+from concurrent.futures import ProcessPoolExecutor
+from itertools import batched, chain, tee
 from pathlib import Path
-from typing import Any, Iterable, List, Optional, Tuple
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-import ginza  # type: ignore
+import numpy as np  # type: ignore
 import polars as pl  # type: ignore
-import spacy  # type: ignore
-import torch  # type: ignore
-from spacy.symbols import (  # type: ignore
-    ADP,
-    NOUN,
-    NUM,
-    PRON,
-    PROPN,
-    PUNCT,
-    SCONJ,
-    SYM,
-    VERB,
-    nsubj,
-    obj,
-    obl,
-)
-from spacy.tokens import Doc, Span, Token  # type: ignore
 
+from natsume_simple import instrumentation
+from natsume_simple.corpus_reader import ensure_line_index, open_lines
 from natsume_simple.log import setup_logger
-from natsume_simple.utils import set_random_seed
+from natsume_simple.parse_cache import ParseCache
+from natsume_simple.utils import file_sha256, set_random_seed
+
+# spaCy and GiNZA are imported on first use, as importing them takes seconds
+# and the command line help and the imports of other modules need neither.
+if TYPE_CHECKING:
+    import spacy  # type: ignore
+    from spacy.tokens import Doc, Span, Token  # type: ignore
 
 logger = setup_logger(__name__)
 
 
 def load_nlp_model(
     model_name: Optional[str] = None,
-) -> Tuple[spacy.language.Language, Token]:
+) -> Tuple["spacy.language.Language", "Token"]:
     """
     Load and return the NLP model and a constant する token.
 
@@ -43,6 +58,8 @@ def load_nlp_model(
     Returns:
         Tuple[spacy.language.Language, Token]: The loaded NLP model and a constant する token.
     """
+    import spacy  # type: ignore
+    import torch  # type: ignore
 
     if torch.cuda.is_available():
         logger.info("GPU is available. Enabling GPU support for spaCy.")
@@ -59,6 +76,165 @@ def load_nlp_model(
         except Exception:
             nlp = spacy.load("ja_ginza")
 
+    # Without a split mode the compound splitter leaves docs unchanged. The
+    # other components are needed: `ner` is not read by `npv_matcher`, but
+    # GiNZA's bunsetu recognizer uses the entities to place bunsetu heads.
+    if (
+        "compound_splitter" in nlp.pipe_names
+        and nlp.get_pipe("compound_splitter").split_mode is None
+    ):
+        nlp.remove_pipe("compound_splitter")
+
+    suru_token = nlp("する")[0]
+
+    return nlp, suru_token
+
+
+def default_model_name() -> str:
+    """
+    Return the name results are saved under when no model is given.
+
+    This is the name in the `meta.json` of the model `load_nlp_model` loads by
+    default, read without loading the model.
+
+    Returns:
+        str: `nlp.meta["name"]` of the default model.
+    """
+    import spacy  # type: ignore
+
+    package = (
+        "ja_ginza_bert_large"
+        if spacy.util.is_package("ja_ginza_bert_large")
+        else "ja_ginza"
+    )
+    return spacy.util.get_model_meta(spacy.util.get_package_path(package))["name"]
+
+
+# Peak memory per character of a parsed batch, measured with ja_ginza.
+BATCH_BYTES_PER_CHAR = 50_000
+MIN_BATCH_CHARS = 1_000
+MAX_BATCH_CHARS = 8_000
+# Number of lines sorted by length together before parsing.
+SORT_WINDOW = 1000
+
+
+def available_memory() -> Optional[int]:
+    """Return the memory available to new allocations in bytes, if known."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+@functools.cache
+def max_batch_chars() -> int:
+    """
+    Return the number of characters parsed together in one `nlp.pipe` batch.
+
+    Batches grow with the memory available on first use, so that a batch
+    takes at most a quarter of it, up to `MAX_BATCH_CHARS`, beyond which
+    larger batches were not faster. The `NATSUME_BATCH_CHARS` environment
+    variable overrides it.
+    """
+    if "NATSUME_BATCH_CHARS" in os.environ:
+        return int(os.environ["NATSUME_BATCH_CHARS"])
+    memory = available_memory()
+    if memory is None:
+        return MAX_BATCH_CHARS
+    return max(
+        MIN_BATCH_CHARS, min(MAX_BATCH_CHARS, memory // 4 // BATCH_BYTES_PER_CHAR)
+    )
+
+
+def length_batches(lengths: List[int], batch_chars: int) -> List[List[int]]:
+    """
+    Group items into batches of similar length with at most `batch_chars` in total.
+
+    Items are sorted by length, so that the docs of a batch need little
+    padding, and a batch holds as many items as fit `batch_chars`, but at
+    least one.
+
+    Args:
+        lengths (List[int]): Length of each item.
+        batch_chars (int): Maximum total length of a batch.
+
+    Returns:
+        List[List[int]]: Batches of item indices.
+
+    Examples:
+        >>> length_batches([5, 1, 3, 9, 2], 6)
+        [[1, 4, 2], [0], [3]]
+    """
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    n_chars = 0
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if batch and n_chars + lengths[i] > batch_chars:
+            batches.append(batch)
+            batch, n_chars = [], 0
+        batch.append(i)
+        n_chars += lengths[i]
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_docs(
+    lines: Sequence[str],
+    nlp: "spacy.language.Language",
+    batch_chars: Optional[int] = None,
+) -> List["Doc"]:
+    """
+    Parse lines in batches of similar length and return the docs in input order.
+
+    Args:
+        lines (Sequence[str]): The lines to parse.
+        nlp (spacy.language.Language): The loaded NLP model.
+        batch_chars (Optional[int]): Maximum characters per batch; see `max_batch_chars`.
+
+    Returns:
+        List[Doc]: The doc of each line.
+
+    Examples:
+        >>> import spacy
+        >>> nlp = spacy.load("ja_ginza")
+        >>> [doc.text for doc in parse_docs(["長い文を書く。", "短い", "本"], nlp, 4)]
+        ['長い文を書く。', '短い', '本']
+    """
+    docs: List[Doc] = [None] * len(lines)  # type: ignore
+    for batch in length_batches(
+        [len(line) for line in lines], batch_chars or max_batch_chars()
+    ):
+        texts = [lines[i] for i in batch]
+        for i, doc in zip(batch, instrumentation.pipe(nlp, texts, len(texts))):
+            docs[i] = doc
+    return docs
+
+
+def load_tokenizer(model_name: str) -> Tuple["spacy.language.Language", "Token"]:
+    """
+    Load only the tokenizer and vocabulary of a model and a constant する token.
+
+    This is sufficient for matching on saved parses and avoids loading the
+    pipeline components' weights.
+
+    Args:
+        model_name (str): The name of the model to load.
+
+    Returns:
+        Tuple[spacy.language.Language, Token]: The component-less model and a constant する token.
+    """
+    import spacy  # type: ignore
+
+    meta = spacy.util.load_meta(spacy.util.get_package_path(model_name) / "meta.json")
+    nlp = spacy.load(model_name, exclude=meta["components"])
     suru_token = nlp("する")[0]
 
     return nlp, suru_token
@@ -86,7 +262,7 @@ def pairwise(iterable: Iterable[Any]) -> Iterator[Tuple[Any, Any]]:
     return zip(a, b)
 
 
-def simple_lemma(token: Token) -> str:
+def simple_lemma(token: "Token") -> str:
     """Get a simplified lemma for a UniDic token.
 
     Args:
@@ -96,7 +272,7 @@ def simple_lemma(token: Token) -> str:
         str: The simplified lemma.
 
     Examples:
-        >>> from spacy.tokens import Token
+        >>> import spacy
         >>> nlp = spacy.load("ja_ginza")
         >>> simple_lemma(nlp("する")[0])
         'する'
@@ -113,60 +289,205 @@ def simple_lemma(token: Token) -> str:
         return token.norm_
 
 
-def normalize_verb_span(tokens: Doc | Span, suru_token: Token) -> Optional[str]:
+# Inflection types of verbs and auxiliaries, which take ます and た directly.
+INFLECTED_VERB = re.compile(r"^(五|上|下|サ|.変格|助動詞).+")
+STOP_NORMS = {"から", "ため", "たり", "こと", "よう"}
+CASE_PARTICLES = ["が", "を", "に", "で", "から", "より", "と", "へ"]
+
+
+def signed_ids(ids: Iterable[int]) -> Set[int]:
+    """
+    Return symbol ids or string hashes as they read in a signed `Doc.to_array`.
+
+    Examples:
+        >>> signed_ids([1, 2**64 - 1])
+        {1, -1}
+    """
+    return set(np.array(list(ids), dtype=np.uint64).view(np.int64).tolist())
+
+
+class SymbolIds(NamedTuple):
+    """spaCy symbol ids and string hashes compared by the matchers.
+
+    The `signed_` fields hold ids as they read in the signed `Doc.to_array`
+    columns of `npv_matcher_array`.
+    """
+
+    skipped_pos: Set[int]
+    stop_pos: Set[int]
+    noun_pos: Set[int]
+    noun_dep: Set[int]
+    verb: int
+    signed_noun_pos: Set[int]
+    signed_noun_dep: Set[int]
+    signed_case_particles: Set[int]
+    signed_case_dep: int
+    signed_fixed_dep: int
+
+
+@functools.cache
+def symbol_ids() -> SymbolIds:
+    """
+    Return the symbol ids and string hashes compared by the matchers.
+
+    They are computed on first use so that spaCy is only imported then.
+
+    Examples:
+        >>> ids = symbol_ids()
+        >>> ids.verb in ids.noun_pos, len(ids.signed_case_particles)
+        (False, 8)
+    """
+    from spacy.strings import get_string_id  # type: ignore
+    from spacy.symbols import (  # type: ignore
+        ADP,
+        NOUN,
+        NUM,
+        PRON,
+        PROPN,
+        PUNCT,
+        SCONJ,
+        SYM,
+        VERB,
+        nsubj,
+        obj,
+        obl,
+    )
+
+    noun_pos = {NOUN, PROPN, PRON, NUM}
+    noun_dep = {obj, obl, nsubj}
+    (signed_case_dep,) = signed_ids([get_string_id("case")])
+    (signed_fixed_dep,) = signed_ids([get_string_id("fixed")])
+    return SymbolIds(
+        skipped_pos={PUNCT, SYM},
+        stop_pos={ADP, SCONJ},
+        noun_pos=noun_pos,
+        noun_dep=noun_dep,
+        verb=VERB,
+        signed_noun_pos=signed_ids(noun_pos),
+        signed_noun_dep=signed_ids(noun_dep),
+        signed_case_particles=signed_ids(get_string_id(p) for p in CASE_PARTICLES),
+        signed_case_dep=signed_case_dep,
+        signed_fixed_dep=signed_fixed_dep,
+    )
+
+
+def normalize_verb_span(tokens: "Doc | Span", suru_token: "Token") -> Optional[str]:
     """
     Normalize a verb span.
 
+    Punctuation and symbols are skipped and the span is cut before the first
+    particle, conjunction or formal noun. Of the rest, the tokens up to the
+    one before ます, た or だ are kept, with する added after nouns
+    followed by ます or た, and the last token is replaced by its lemma.
+
     Args:
         tokens (Doc | Span): The input tokens.
         suru_token (Token): The constant する token.
 
     Returns:
         Optional[str]: The normalized verb string, or None if normalization fails.
+
+    Examples:
+        >>> import spacy
+        >>> nlp = spacy.load("ja_ginza")
+        >>> suru_token = nlp("する")[0]
+        >>> normalize_verb_span(nlp("読みました"), suru_token)
+        '読む'
+        >>> normalize_verb_span(nlp("勉強しています"), suru_token)
+        '勉強する'
+        >>> normalize_verb_span(nlp("静かだ"), suru_token)
+        '静か'
+        >>> normalize_verb_span(nlp("。"), suru_token) is None
+        True
     """
-    clean_tokens = [token for token in tokens if token.pos not in {PUNCT, SYM}]
-    clean_tokens = list(
-        takewhile(
-            lambda token: token.pos not in {ADP, SCONJ}
-            and token.norm_ not in {"から", "ため", "たり", "こと", "よう"},
-            clean_tokens,
-        )
-    )
+    import ginza  # type: ignore
+
+    ids = symbol_ids()
+    clean_tokens: List[Token] = []
+    for token in tokens:
+        if token.pos in ids.skipped_pos:
+            continue
+        if token.pos in ids.stop_pos or token.norm_ in STOP_NORMS:
+            break
+        clean_tokens.append(token)
     if len(clean_tokens) == 1:
         return simple_lemma(clean_tokens[0])
 
-    normalized_tokens: List[Token] = []
-    token_pairs: List[Tuple[Token, Token]] = list(pairwise(clean_tokens))
-    for i, (token, next_token) in enumerate(token_pairs):
-        normalized_tokens.append(token)
-        if next_token.lemma_ in ["ます", "た"]:
-            if re.match(r"^(五|上|下|サ|.変格|助動詞).+", ginza.inflection(token)):
-                break
-            else:
-                normalized_tokens.append(suru_token)
-                break
-        elif next_token.lemma_ == "だ":
+    # Keep clean_tokens[:end], followed by する if add_suru.
+    end, add_suru = len(clean_tokens), False
+    for i in range(len(clean_tokens) - 1):
+        next_lemma = clean_tokens[i + 1].lemma_
+        if next_lemma == "ます" or next_lemma == "た":
+            end = i + 1
+            add_suru = not INFLECTED_VERB.match(ginza.inflection(clean_tokens[i]))
+            break
+        elif next_lemma == "だ":
+            end = i + 1
             break
-        elif i == len(token_pairs) - 1:
-            normalized_tokens.append(next_token)
-
-    if len(normalized_tokens) == 1:
-        return simple_lemma(normalized_tokens[0])
 
-    if not normalized_tokens:
+    if end == 0:
         return None
+    if end == 1 and not add_suru:
+        return simple_lemma(clean_tokens[0])
 
-    stem = normalized_tokens[0]
-    affixes = normalized_tokens[1:-1]
-    suffix = normalized_tokens[-1]
+    suffix = suru_token if add_suru else clean_tokens[end - 1]
+    affixes = clean_tokens[1:end] if add_suru else clean_tokens[1 : end - 1]
     return "{}{}{}".format(
-        stem.text,
+        clean_tokens[0].text,
         "".join(t.text for t in affixes),
         simple_lemma(suffix),
     )
 
 
-def npv_matcher(doc: Doc, suru_token: Token) -> List[Tuple[str, str, str]]:
+# Token attributes read by `normalize_verb_span`, which key `verb_phrase_cache`.
+VERB_PHRASE_FEATURES = ["ORTH", "POS", "NORM", "LEMMA", "MORPH"]
+VERB_PHRASE_CACHE_SIZE = 1 << 16
+verb_phrase_cache: Dict[bytes, Optional[str]] = {}
+
+
+def normalize_verb_bunsetu(
+    span: "Span", features: bytes, suru_token: "Token"
+) -> Optional[str]:
+    """
+    Normalize the bunsetu of a verb, memoized across documents.
+
+    `normalize_verb_span` only reads the text, part of speech, norm, lemma
+    and inflection of the tokens, so bunsetu with the same hashes of these
+    normalize to the same string. The memo is cleared when it holds
+    `VERB_PHRASE_CACHE_SIZE` entries.
+
+    Args:
+        span (Span): Bunsetu of the verb.
+        features (bytes): The `VERB_PHRASE_FEATURES` of the span's tokens, as
+            returned by `Doc.to_array`.
+        suru_token (Token): The constant する token.
+
+    Returns:
+        Optional[str]: The normalized verb string, or None if normalization fails.
+
+    Examples:
+        >>> import ginza
+        >>> import spacy
+        >>> nlp = spacy.load("ja_ginza")
+        >>> suru_token = nlp("する")[0]
+        >>> doc = nlp("本を読みました。")
+        >>> span = ginza.bunsetu_span(doc[2])
+        >>> features = doc.to_array(VERB_PHRASE_FEATURES)[span.start : span.end]
+        >>> normalize_verb_bunsetu(span, features.tobytes(), suru_token)
+        '読む'
+    """
+    try:
+        return verb_phrase_cache[features]
+    except KeyError:
+        pass
+    vp_string = normalize_verb_span(span, suru_token)
+    if len(verb_phrase_cache) >= VERB_PHRASE_CACHE_SIZE:
+        verb_phrase_cache.clear()
+    verb_phrase_cache[features] = vp_string
+    return vp_string
+
+
+def npv_matcher(doc: "Doc", suru_token: "Token") -> List[Tuple[str, str, str]]:
     """
     Extract NPV (Noun-Particle-Verb) patterns from a document.
 
@@ -176,27 +497,39 @@ def npv_matcher(doc: Doc, suru_token: Token) -> List[Tuple[str, str, str]]:
     Returns:
         List[Tuple[str, str, str]]: A list of NPV patterns.
     """
+    import ginza  # type: ignore
+
+    ids = symbol_ids()
     matches: List[Tuple[str, str, str]] = []
+    # Normalized verb phrases by verb index, as a verb heads several matches.
+    verb_phrases: Dict[int, Optional[str]] = {}
+    features = None
     for token in doc[:-2]:
         noun = token
         case_particle = noun.nbor(1)
         verb = token.head
         if (
-            noun.pos in {NOUN, PROPN, PRON, NUM}
-            and noun.dep in {obj, obl, nsubj}
-            and verb.pos == VERB
+            noun.pos in ids.noun_pos
+            and noun.dep in ids.noun_dep
+            and verb.pos == ids.verb
             and case_particle.dep_ == "case"
-            and case_particle.lemma_
-            in {"が", "を", "に", "で", "から", "より", "と", "へ"}
+            and case_particle.lemma_ in CASE_PARTICLES
             and case_particle.nbor().dep_ != "fixed"
             and case_particle.nbor().head != case_particle.head
         ):
-            verb_bunsetu_span = ginza.bunsetu_span(verb)
-            vp_string = normalize_verb_span(verb_bunsetu_span, suru_token)
+            if verb.i not in verb_phrases:
+                if features is None:
+                    features = doc.to_array(VERB_PHRASE_FEATURES)
+                span = ginza.bunsetu_span(verb)
+                verb_phrases[verb.i] = normalize_verb_bunsetu(
+                    span, features[span.start : span.end].tobytes(), suru_token
+                )
+            vp_string = verb_phrases[verb.i]
             if not vp_string:
                 logger.error(
-                    f"Error normalizing verb phrase: {verb_bunsetu_span} in document {doc}"
+                    f"Error normalizing verb phrase: {ginza.bunsetu_span(verb)} in document {doc}"
                 )
+                instrumentation.count("normalize_failures")
                 continue
             matches.append(
                 (
@@ -208,8 +541,210 @@ def npv_matcher(doc: Doc, suru_token: Token) -> List[Tuple[str, str, str]]:
     return matches
 
 
+# Columns of `Doc.to_array` read by `npv_matcher_array`, starting with the
+# `VERB_PHRASE_FEATURES`, and the ids compared with them. The columns are read
+# as signed integers, so that HEAD is the offset to the head.
+MATCH_FEATURES = [*VERB_PHRASE_FEATURES, "DEP", "HEAD", "SENT_START"]
+
+
+def bunsetu_bounds(
+    labels: Sequence[str], sent_starts: Sequence[int], i: int
+) -> Tuple[int, int]:
+    """
+    Return the start and end of the bunsetu of a token, as `ginza.bunsetu_span` does.
+
+    Args:
+        labels (Sequence[str]): Bunsetu B/I label of each token of the doc.
+        sent_starts (Sequence[int]): SENT_START value of each token of the doc.
+        i (int): Index of the token.
+
+    Returns:
+        Tuple[int, int]: Index of the first token of the bunsetu and one past the last.
+
+    Examples:
+        >>> bunsetu_bounds(["B", "I", "B", "I", "I"], [1, -1, -1, -1, -1], 3)
+        (2, 5)
+        >>> bunsetu_bounds(["B", "I", "I", "B"], [1, -1, 1, -1], 2)
+        (2, 3)
+    """
+    start = 0
+    for j in range(i, 0, -1):
+        if labels[j] == "B" or sent_starts[j] == 1:
+            start = j
+            break
+    end = len(labels)
+    for j in range(i + 1, len(labels)):
+        if labels[j] == "B":
+            end = j
+            break
+    return start, end
+
+
+def npv_matcher_array(doc: "Doc", suru_token: "Token") -> List[Tuple[str, str, str]]:
+    """
+    Extract NPV (Noun-Particle-Verb) patterns like `npv_matcher`, from `Doc.to_array`.
+
+    The token attributes are read once with `Doc.to_array`, and the tokens
+    followed by a case particle are selected with one array comparison. Only
+    these are checked against the other conditions of `npv_matcher`, on plain
+    integers rather than `Token` objects, and the bunsetu of their verbs is
+    located with `bunsetu_bounds` instead of `ginza.bunsetu_span`. The output
+    is identical to that of `npv_matcher`.
+
+    Args:
+        doc (Doc): The input spaCy document.
+        suru_token (Token): The constant する token.
+
+    Returns:
+        List[Tuple[str, str, str]]: A list of NPV patterns.
+
+    Examples:
+        >>> import spacy
+        >>> nlp = spacy.load("ja_ginza")
+        >>> suru_token = nlp("する")[0]
+        >>> doc = nlp("彼が図書館で本を読みました。")
+        >>> npv_matcher_array(doc, suru_token)
+        [('彼', 'が', '読む'), ('図書館', 'で', '読む'), ('本', 'を', '読む')]
+        >>> npv_matcher_array(doc, suru_token) == npv_matcher(doc, suru_token)
+        True
+    """
+    from ginza.bunsetu_recognizer import bunsetu_bi_labels  # type: ignore
+
+    if len(doc) < 3:
+        return []
+    ids = symbol_ids()
+    features = doc.to_array(MATCH_FEATURES)
+    columns = features.view(np.int64)
+    nouns = np.flatnonzero(columns[1:-1, 5] == ids.signed_case_dep).tolist()
+    if not nouns:
+        return []
+    _, pos, _, lemma, _, dep, offsets, sent_starts = columns.T.tolist()
+
+    matches: List[Tuple[str, str, str]] = []
+    verb_phrases: Dict[int, Tuple[int, int, Optional[str]]] = {}
+    labels = bunsetu_bi_labels(doc)
+    strings = doc.vocab.strings
+    n_features = len(VERB_PHRASE_FEATURES)
+    for i in nouns:
+        verb = i + offsets[i]
+        particle = i + 1
+        next_token = i + 2
+        if not (
+            pos[i] in ids.signed_noun_pos
+            and dep[i] in ids.signed_noun_dep
+            and pos[verb] == ids.verb
+            and lemma[particle] in ids.signed_case_particles
+            and dep[next_token] != ids.signed_fixed_dep
+            and next_token + offsets[next_token] != particle + offsets[particle]
+        ):
+            continue
+        if verb not in verb_phrases:
+            start, end = bunsetu_bounds(labels, sent_starts, verb)
+            verb_phrases[verb] = (
+                start,
+                end,
+                normalize_verb_bunsetu(
+                    doc[start:end],
+                    features[start:end, :n_features].tobytes(),
+                    suru_token,
+                ),
+            )
+        start, end, vp_string = verb_phrases[verb]
+        if not vp_string:
+            logger.error(
+                f"Error normalizing verb phrase: {doc[start:end]} in document {doc}"
+            )
+            instrumentation.count("normalize_failures")
+            continue
+        matches.append(
+            (
+                strings[int(features[i, 2])],
+                strings[int(features[particle, 2])],
+                vp_string,
+            )
+        )
+    return matches
+
+
+Matcher = Callable[["Doc", "Token"], List[Tuple[str, str, str]]]
+MATCHERS: Dict[str, Matcher] = {"token": npv_matcher, "array": npv_matcher_array}
+
+
+def iter_matches(
+    corpus: Iterable[str],
+    nlp: "spacy.language.Language",
+    suru_token: "Token",
+    parse_cache: Optional[ParseCache] = None,
+    matcher: Matcher = npv_matcher,
+) -> Iterator[List[Tuple[str, str, str]]]:
+    """
+    Lazily parse a corpus and yield the NPV patterns of each line in order.
+
+    Args:
+        corpus (Iterable[str]): The input corpus, consumed lazily.
+        nlp (spacy.language.Language): The loaded NLP model.
+        suru_token (Token): The constant する token.
+        parse_cache (Optional[ParseCache]): Cache of parses and matches; lines
+            found in it are not parsed or matched again.
+        matcher (Matcher): Function extracting the patterns of a doc.
+
+    Yields:
+        List[Tuple[str, str, str]]: The NPV patterns of one line.
+    """
+    from spacy.tokens import DocBin  # type: ignore
+
+    if parse_cache is None:
+        for chunk in batched(corpus, SORT_WINDOW):
+            with instrumentation.stage("parse"):
+                docs = parse_docs(chunk, nlp)
+            with instrumentation.stage("match"):
+                line_matches = [matcher(doc, suru_token) for doc in docs]
+            yield from line_matches
+        return
+
+    for chunk in batched(corpus, SORT_WINDOW):
+        with instrumentation.stage("cache"):
+            match_keys = [parse_cache.match_key(line) for line in chunk]
+            cached_matches = parse_cache.get_many(match_keys, "match")
+            missing = [
+                i for i, key in enumerate(match_keys) if key not in cached_matches
+            ]
+            doc_keys = {i: parse_cache.doc_key(chunk[i]) for i in missing}
+            cached_docs = parse_cache.get_many(doc_keys.values(), "doc")
+        to_parse = [i for i in missing if doc_keys[i] not in cached_docs]
+
+        with instrumentation.stage("parse"):
+            parsed = parse_docs([chunk[i] for i in to_parse], nlp)
+        new_entries: Dict[str, bytes] = {}
+        docs: Dict[int, Doc] = dict(zip(to_parse, parsed))
+        with instrumentation.stage("cache"):
+            for i, doc in docs.items():
+                new_entries[doc_keys[i]] = DocBin(
+                    store_user_data=True, docs=[doc]
+                ).to_bytes()
+            for i in missing:
+                if i not in docs:
+                    doc_bin = DocBin().from_bytes(cached_docs[doc_keys[i]])
+                    docs[i] = next(doc_bin.get_docs(nlp.vocab))
+
+        with instrumentation.stage("match"):
+            chunk_matches = {i: matcher(docs[i], suru_token) for i in missing}
+        with instrumentation.stage("cache"):
+            for i in missing:
+                new_entries[match_keys[i]] = json.dumps(
+                    chunk_matches[i], ensure_ascii=False
+                ).encode("utf-8")
+            parse_cache.put_many(new_entries)
+
+        for i, key in enumerate(match_keys):
+            if i in chunk_matches:
+                yield chunk_matches[i]
+            else:
+                yield [tuple(m) for m in json.loads(cached_matches[key])]  # type: ignore
+
+
 def process_corpus(
-    corpus: List[str], nlp: spacy.language.Language, suru_token: Token
+    corpus: List[str], nlp: "spacy.language.Language", suru_token: "Token"
 ) -> List[Tuple[str, str, str]]:
     """
     Process the entire corpus and extract NPV patterns.
@@ -222,9 +757,34 @@ def process_corpus(
     Returns:
         List[Tuple[str, str, str]]: A list of NPV patterns extracted from the corpus.
     """
-    return list(
-        chain.from_iterable(npv_matcher(doc, suru_token) for doc in nlp.pipe(corpus))
-    )
+    return list(chain.from_iterable(iter_matches(corpus, nlp, suru_token)))
+
+
+def write_results(
+    results: List[Tuple[str, str, str]],
+    f: IO[bytes],
+    corpus_name: str,
+    include_header: bool = True,
+) -> None:
+    """
+    Write results as CSV rows to an open binary file.
+
+    Args:
+        results (List[Tuple[str, str, str]]): The NPV patterns to write.
+        f (IO[bytes]): The binary file object to write to.
+        corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        include_header (bool): Whether to write the CSV header line.
+
+    Examples:
+        >>> from io import BytesIO
+        >>> buffer = BytesIO()
+        >>> write_results([("本", "を", "読む")], buffer, "ted")
+        >>> buffer.getvalue().decode("utf-8")
+        'n,p,v,corpus\\n本,を,読む,ted\\n'
+    """
+    df = pl.DataFrame(results, schema=["n", "p", "v"], orient="row")
+    df = df.with_columns(pl.lit(corpus_name).alias("corpus"))
+    df.write_csv(f, include_header=include_header)
 
 
 def save_results(
@@ -243,12 +803,718 @@ def save_results(
         model_name (str): Name of the spaCy model used.
     """
     output_file = data_dir / f"{corpus_name}_npvs_{model_name}.csv"
-    df = pl.DataFrame(results, schema=["n", "p", "v"], orient="row")
-    df = df.with_columns(pl.lit(corpus_name).alias("corpus"))
-    df.write_csv(output_file)
+    with open(output_file, "wb") as f:
+        write_results(results, f, corpus_name)
 
 
-nlp, suru_token = load_nlp_model()
+RESULT_SCHEMA = {"n": pl.String, "p": pl.String, "v": pl.String, "corpus": pl.String}
+RESULT_SUFFIXES = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+
+def convert_results(
+    csv_file: Path, output_format: str = "parquet", aggregate: bool = False
+) -> Path:
+    """
+    Convert a results CSV file to a columnar file with dictionary-encoded strings.
+
+    The conversion is streamed, so the CSV file is never loaded whole. The
+    string columns are stored as categoricals, which Parquet and Arrow IPC
+    encode as dictionaries. With `aggregate`, identical rows are counted into a
+    `frequency` column and sorted, as `server.load_database` would do on load.
+    The CSV file is removed unless it is also the output file.
+
+    Args:
+        csv_file (Path): The CSV file written by extraction.
+        output_format (str): One of 'csv', 'parquet' or 'arrow' (Arrow IPC).
+        aggregate (bool): Whether to aggregate rows into frequencies.
+
+    Returns:
+        Path: The path of the converted file.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     csv_file = Path(d) / "ted_npvs_ja_ginza.csv"
+        ...     with open(csv_file, "wb") as f:
+        ...         write_results([("本", "を", "読む")] * 2, f, "ted")
+        ...     output_file = convert_results(csv_file, "parquet", aggregate=True)
+        ...     output_file.name, pl.read_parquet(output_file).rows()
+        ('ted_npvs_ja_ginza.parquet', [('本', 'を', '読む', 'ted', 2)])
+    """
+    lf = pl.scan_csv(csv_file, schema=RESULT_SCHEMA)
+    if aggregate:
+        lf = (
+            lf.group_by(list(RESULT_SCHEMA))
+            .agg(pl.len().alias("frequency"))
+            .sort(list(RESULT_SCHEMA))
+        )
+    output_file = csv_file.with_suffix(RESULT_SUFFIXES[output_format])
+    tmp_file = output_file.with_name(output_file.name + ".tmp")
+
+    if output_format == "csv":
+        lf.sink_csv(tmp_file)
+    else:
+        lf = lf.with_columns(pl.col(list(RESULT_SCHEMA)).cast(pl.Categorical))
+        if output_format == "parquet":
+            lf.sink_parquet(tmp_file)
+        else:
+            lf.sink_ipc(tmp_file)
+
+    os.replace(tmp_file, output_file)
+    if output_file != csv_file:
+        csv_file.unlink()
+    return output_file
+
+
+def shard_ranges(n_lines: int, n_shards: int) -> List[Tuple[int, int]]:
+    """
+    Split a number of lines into contiguous, near-equal line ranges.
+
+    Args:
+        n_lines (int): Total number of lines.
+        n_shards (int): Number of shards to split into.
+
+    Returns:
+        List[Tuple[int, int]]: Half-open (start, end) line ranges in input order.
+
+    Examples:
+        >>> shard_ranges(10, 3)
+        [(0, 4), (4, 7), (7, 10)]
+        >>> shard_ranges(2, 4)
+        [(0, 1), (1, 2)]
+        >>> shard_ranges(0, 4)
+        []
+    """
+    n_shards = max(1, min(n_shards, n_lines))
+    size, remainder = divmod(n_lines, n_shards)
+    ranges: List[Tuple[int, int]] = []
+    start = 0
+    for i in range(n_shards if n_lines else 0):
+        end = start + size + (1 if i < remainder else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def write_match_stream(
+    line_matches: Iterable[List[Tuple[str, str, str]]],
+    f: IO[bytes],
+    corpus_name: str,
+    batch_size: int = 10000,
+    log_interval: float = 30.0,
+    include_header: bool = True,
+    on_write: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[int, int]:
+    """
+    Write the NPV patterns of a lazily produced sequence of lines in batches.
+
+    Patterns are buffered until at least `batch_size` have accumulated and are
+    then appended to `f` as CSV rows, so memory use does not grow with the
+    size of the corpus. The output is identical to that of `save_results`.
+
+    Args:
+        line_matches (Iterable[List[Tuple[str, str, str]]]): The NPV patterns
+            of each line, in order.
+        f (IO[bytes]): The binary file object to write the CSV to.
+        corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        batch_size (int): Number of patterns buffered before each write.
+        log_interval (float): Seconds between progress log messages.
+        include_header (bool): Whether to start the output with the CSV header.
+        on_write (Optional[Callable[[int, int], None]]): Called after each batch
+            is written with the number of lines processed and patterns written
+            so far. Batches always end on a line boundary.
+
+    Returns:
+        Tuple[int, int]: The number of lines processed and patterns written.
+
+    Examples:
+        >>> from io import BytesIO
+        >>> buffer = BytesIO()
+        >>> write_match_stream([[("本", "を", "読む")], [], [("彼", "に", "会う")]], buffer, "ted", batch_size=1)
+        (3, 2)
+        >>> buffer.getvalue().decode("utf-8").splitlines()
+        ['n,p,v,corpus', '本,を,読む,ted', '彼,に,会う,ted']
+    """
+    if include_header:
+        write_results([], f, corpus_name)
+    batch: List[Tuple[str, str, str]] = []
+    n_lines = n_results = 0
+    start_time = last_log_time = time.perf_counter()
+    for n_lines, matches in enumerate(line_matches, 1):
+        batch.extend(matches)
+        if len(batch) >= batch_size:
+            with instrumentation.stage("write"):
+                write_results(batch, f, corpus_name, include_header=False)
+                n_results += len(batch)
+                batch = []
+                if on_write:
+                    on_write(n_lines, n_results)
+            instrumentation.progress(n_lines, n_results)
+
+        now = time.perf_counter()
+        if now - last_log_time >= log_interval:
+            logger.info(
+                f"Processed {n_lines} lines ({n_lines / (now - start_time):.1f} lines/sec)."
+            )
+            last_log_time = now
+
+    with instrumentation.stage("write"):
+        write_results(batch, f, corpus_name, include_header=False)
+        n_results += len(batch)
+        if on_write:
+            on_write(n_lines, n_results)
+    instrumentation.progress(n_lines, n_results)
+    return n_lines, n_results
+
+
+def stream_corpus(
+    corpus: Iterable[str],
+    f: IO[bytes],
+    corpus_name: str,
+    nlp: "spacy.language.Language",
+    suru_token: "Token",
+    batch_size: int = 10000,
+    log_interval: float = 30.0,
+    include_header: bool = True,
+    on_write: Optional[Callable[[int, int], None]] = None,
+    parse_cache: Optional[ParseCache] = None,
+    matcher: Matcher = npv_matcher,
+) -> Tuple[int, int]:
+    """
+    Extract NPV patterns from a lazily read corpus, writing them in batches.
+
+    See `write_match_stream` for how patterns are written.
+
+    Args:
+        corpus (Iterable[str]): The input corpus, e.g. an open file object.
+        f (IO[bytes]): The binary file object to write the CSV to.
+        corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        nlp (spacy.language.Language): The loaded NLP model.
+        suru_token (Token): The constant する token.
+        batch_size (int): Number of patterns buffered before each write.
+        log_interval (float): Seconds between progress log messages.
+        include_header (bool): Whether to start the output with the CSV header.
+        on_write (Optional[Callable[[int, int], None]]): Called after each
+            batch is written, see `write_match_stream`.
+        parse_cache (Optional[ParseCache]): Cache of parses and matches.
+        matcher (Matcher): Function extracting the patterns of a doc.
+
+    Returns:
+        Tuple[int, int]: The number of lines processed and patterns extracted.
+    """
+    return write_match_stream(
+        iter_matches(corpus, nlp, suru_token, parse_cache, matcher),
+        f,
+        corpus_name,
+        batch_size,
+        log_interval,
+        include_header,
+        on_write,
+    )
+
+
+def code_version() -> str:
+    """
+    Return the package version combined with a hash of this module's source.
+
+    Returns:
+        str: A version string that changes whenever the extraction code changes.
+    """
+    try:
+        version = importlib.metadata.version("natsume-simple")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    source_hash = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+    return f"{version}+{source_hash}"
+
+
+def load_checkpoint(checkpoint_file: Path) -> Optional[Dict[str, Any]]:
+    """
+    Load an extraction checkpoint if one exists.
+
+    Args:
+        checkpoint_file (Path): The path to the checkpoint JSON file.
+
+    Returns:
+        Optional[Dict[str, Any]]: The checkpoint, or None if missing or unreadable.
+    """
+    try:
+        with open(checkpoint_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(checkpoint_file: Path, checkpoint: Dict[str, Any]) -> None:
+    """
+    Atomically write an extraction checkpoint.
+
+    Args:
+        checkpoint_file (Path): The path to the checkpoint JSON file.
+        checkpoint (Dict[str, Any]): The checkpoint to save.
+    """
+    tmp_file = checkpoint_file.with_name(checkpoint_file.name + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, checkpoint_file)
+
+
+def checkpoint_path(output_file: Path) -> Path:
+    """Return the checkpoint file path belonging to an output file."""
+    return output_file.with_name(output_file.name + ".checkpoint.json")
+
+
+def extract_range(
+    input_file: Path,
+    start: int,
+    end: Optional[int],
+    output_file: Path,
+    corpus_name: str,
+    nlp: "spacy.language.Language",
+    suru_token: "Token",
+    run_info: Dict[str, Any],
+    batch_size: int = 10000,
+    parse_cache: Optional[ParseCache] = None,
+    matcher: Matcher = npv_matcher,
+) -> Tuple[int, int]:
+    """
+    Extract NPV patterns from a line range into a CSV file, resumably.
+
+    Output is written to `{output_file}.partial`, and after every batch the
+    file is synced and a checkpoint recording the next input line and the
+    committed output size is written next to it. If a checkpoint from an
+    interrupted run with the same `run_info` and line range exists, the
+    partial file is truncated to its last committed size and extraction
+    continues from the recorded line, so the final file is identical to that
+    of an uninterrupted run. On completion the partial file is renamed to
+    `output_file` and the checkpoint is marked complete.
+
+    Args:
+        input_file (Path): The path to the input corpus file.
+        start (int): Index of the first line to process.
+        end (Optional[int]): Index one past the last line, or None for the end of file.
+        output_file (Path): The path of the CSV file to write.
+        corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        nlp (spacy.language.Language): The loaded NLP model.
+        suru_token (Token): The constant する token.
+        run_info (Dict[str, Any]): Input hash, model name and code version of the run.
+        batch_size (int): Number of patterns buffered before each write.
+        parse_cache (Optional[ParseCache]): Cache of parses and matches.
+        matcher (Matcher): Function extracting the patterns of a doc.
+
+    Returns:
+        Tuple[int, int]: The number of lines processed and patterns extracted.
+    """
+    checkpoint_file = checkpoint_path(output_file)
+    partial_file = output_file.with_name(output_file.name + ".partial")
+    identity = dict(run_info, corpus=corpus_name, start=start, end=end)
+    checkpoint = dict(identity, line=start, bytes=0, n_results=0, complete=False)
+
+    previous = load_checkpoint(checkpoint_file)
+    if previous and {k: previous.get(k) for k in identity} == identity:
+        if previous["complete"] and output_file.is_file():
+            logger.info(f"{output_file} is already complete, skipping.")
+            return previous["line"] - start, previous["n_results"]
+        if (
+            not previous["complete"]
+            and partial_file.is_file()
+            and partial_file.stat().st_size >= previous["bytes"]
+        ):
+            checkpoint = previous
+            logger.info(f"Resuming {output_file} from line {checkpoint['line']}.")
+
+    first_line, first_results = checkpoint["line"], checkpoint["n_results"]
+    resuming = checkpoint["bytes"] > 0
+    with (
+        open_lines(input_file, first_line, end) as f,
+        open(partial_file, "r+b" if resuming else "wb") as out,
+    ):
+        out.truncate(checkpoint["bytes"])
+        out.seek(checkpoint["bytes"])
+
+        def commit(n_lines: int, n_results: int) -> None:
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.update(
+                line=first_line + n_lines,
+                bytes=out.tell(),
+                n_results=first_results + n_results,
+            )
+            save_checkpoint(checkpoint_file, checkpoint)
+
+        stream_corpus(
+            f,
+            out,
+            corpus_name,
+            nlp,
+            suru_token,
+            batch_size,
+            include_header=not resuming,
+            on_write=commit,
+            parse_cache=parse_cache,
+            matcher=matcher,
+        )
+
+    os.replace(partial_file, output_file)
+    checkpoint["complete"] = True
+    save_checkpoint(checkpoint_file, checkpoint)
+    return checkpoint["line"] - start, checkpoint["n_results"]
+
+
+def open_parse_cache(
+    cache_dir: Optional[Path],
+    model_name: str,
+    nlp: "spacy.language.Language",
+    max_bytes: int,
+) -> Optional[ParseCache]:
+    """
+    Open the parse cache for a model, or return None if caching is disabled.
+
+    Args:
+        cache_dir (Optional[Path]): Directory of the cache, or None to disable it.
+        model_name (str): Name of the spaCy model.
+        nlp (spacy.language.Language): The loaded NLP model.
+        max_bytes (int): Size cap of the cache.
+
+    Returns:
+        Optional[ParseCache]: The opened cache, or None.
+    """
+    if cache_dir is None:
+        return None
+    return ParseCache(
+        cache_dir, model_name, nlp.meta["version"], code_version(), max_bytes
+    )
+
+
+def _init_worker(
+    model_name: Optional[str],
+    seed: int,
+    used_model: str,
+    cache_dir: Optional[Path],
+    cache_max_bytes: int,
+    matcher_name: str = "token",
+) -> None:
+    """Load the model and open the parse cache once per worker process."""
+    global nlp, suru_token, parse_cache, matcher
+    set_random_seed(seed)
+    nlp, suru_token = load_nlp_model(model_name)
+    parse_cache = open_parse_cache(cache_dir, used_model, nlp, cache_max_bytes)
+    matcher = MATCHERS[matcher_name]
+
+
+def _process_shard(
+    input_file: Path,
+    start: int,
+    end: int,
+    part_file: Path,
+    corpus_name: str,
+    run_info: Dict[str, Any],
+    batch_size: int,
+    instrument: bool = False,
+    profile_file: Optional[Path] = None,
+) -> Tuple[int, int, Optional[Dict[str, Any]]]:
+    """
+    Extract NPV patterns from one line range and write them to a part file.
+
+    With `instrument`, the instrumentation report of the shard is returned
+    with the counts; with `profile_file`, the shard is profiled to
+    `{profile_file}.{part file stem}`.
+    """
+    run = (
+        instrumentation.Instrumentation({"start": start, "end": end})
+        if instrument
+        else None
+    )
+    shard_profile_file = (
+        profile_file.with_name(f"{profile_file.name}.{part_file.stem}")
+        if profile_file
+        else None
+    )
+    with instrumentation.recording(run, shard_profile_file):
+        n_lines, n_results = extract_range(
+            input_file,
+            start,
+            end,
+            part_file,
+            corpus_name,
+            nlp,
+            suru_token,
+            run_info,
+            batch_size,
+            parse_cache,
+            matcher,
+        )
+    if parse_cache:
+        parse_cache.log_stats()
+    return n_lines, n_results, run.report() if run else None
+
+
+def merge_parts(part_files: List[Path], output_file: Path) -> None:
+    """
+    Concatenate CSV part files into one CSV file, keeping only the first header.
+
+    Args:
+        part_files (List[Path]): Part files in input order, each with a header line.
+        output_file (Path): The merged output file.
+    """
+    with open(output_file, "wb") as out:
+        for i, part_file in enumerate(part_files):
+            with open(part_file, "rb") as f:
+                if i > 0:
+                    f.readline()
+                shutil.copyfileobj(f, out)
+
+
+def process_corpus_parallel(
+    input_file: Path,
+    output_file: Path,
+    corpus_name: str,
+    model_name: Optional[str],
+    workers: int,
+    run_info: Dict[str, Any],
+    seed: int = 42,
+    batch_size: int = 10000,
+    cache_dir: Optional[Path] = None,
+    cache_max_bytes: int = 4 << 30,
+    matcher_name: str = "token",
+    profile_file: Optional[Path] = None,
+) -> Tuple[int, int]:
+    """
+    Extract NPV patterns using several worker processes over line-range shards.
+
+    Each worker loads the model once and writes the patterns of its shard to a
+    part file; the parts are then merged in input order, so the output is
+    identical to that of a single-process run. Parts are checkpointed like
+    single-process output, so an interrupted run resumes every unfinished
+    shard when rerun with the same number of workers. If instrumentation is
+    being recorded, the workers record each shard and their reports are added
+    to the current run.
+
+    Args:
+        input_file (Path): The path to the input corpus file.
+        output_file (Path): The path of the merged CSV file.
+        corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        model_name (Optional[str]): The name of the spaCy model to use.
+        workers (int): Number of worker processes.
+        run_info (Dict[str, Any]): Input hash, model name and code version of the run.
+        seed (int): Random seed set in every worker.
+        batch_size (int): Number of patterns buffered before each write.
+        cache_dir (Optional[Path]): Directory of the parse cache, or None to disable it.
+        cache_max_bytes (int): Size cap of the parse cache.
+        matcher_name (str): Name of the matcher in `MATCHERS`.
+        profile_file (Optional[Path]): File the cProfile stats of each shard
+            are dumped next to, see `_process_shard`.
+
+    Returns:
+        Tuple[int, int]: The number of lines processed and patterns extracted.
+    """
+    ranges = shard_ranges(len(ensure_line_index(input_file)) - 1, workers) or [(0, 0)]
+    parts_dir = output_file.with_suffix(".parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    part_files = [parts_dir / f"part-{i:05d}.csv" for i in range(len(ranges))]
+
+    logger.info(f"Processing {len(ranges)} shards with {workers} workers.")
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(ranges)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            model_name,
+            seed,
+            run_info["model"],
+            cache_dir,
+            cache_max_bytes,
+            matcher_name,
+        ),
+    ) as executor:
+        counts = list(
+            executor.map(
+                _process_shard,
+                [input_file] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges],
+                part_files,
+                [corpus_name] * len(ranges),
+                [run_info] * len(ranges),
+                [batch_size] * len(ranges),
+                [instrumentation.current is not None] * len(ranges),
+                [profile_file] * len(ranges),
+            )
+        )
+
+    merge_parts(part_files, output_file)
+    shutil.rmtree(parts_dir)
+    for _, _, report in counts:
+        if instrumentation.current and report:
+            instrumentation.current.add_shard(report)
+    return sum(n for n, _, _ in counts), sum(m for _, m, _ in counts)
+
+
+def docs_dir_path(data_dir: Path, corpus_name: str, model_name: str) -> Path:
+    """Return the directory holding the saved parses of a corpus."""
+    return data_dir / f"{corpus_name}_docs_{model_name}"
+
+
+def parse_corpus(
+    input_file: Path,
+    docs_dir: Path,
+    nlp: "spacy.language.Language",
+    model_name: str,
+    shard_size: int = 10000,
+) -> Tuple[int, int]:
+    """
+    Parse a corpus and save the parses as sharded `DocBin` files.
+
+    Shards are named `shard-{i:05d}.spacy` and hold `shard_size` lines each,
+    in input order. A `meta.json` file records the input file's hash, the
+    model and the shard size; if they match those of an interrupted earlier
+    run, already written shards are kept and parsing continues after them.
+
+    Args:
+        input_file (Path): The path to the input corpus file.
+        docs_dir (Path): Directory to write the shards to.
+        nlp (spacy.language.Language): The loaded NLP model.
+        model_name (str): The name of the model.
+        shard_size (int): Number of lines per shard.
+
+    Returns:
+        Tuple[int, int]: The number of lines parsed and shards written.
+    """
+    from spacy.tokens import DocBin  # type: ignore
+
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    meta_file = docs_dir / "meta.json"
+    meta = {
+        "input_sha256": file_sha256(input_file),
+        "model": model_name,
+        "model_version": nlp.meta["version"],
+        "shard_size": shard_size,
+    }
+
+    previous = load_checkpoint(meta_file)
+    if not previous or {k: previous.get(k) for k in meta} != meta:
+        for shard_file in docs_dir.glob("shard-*.spacy"):
+            shard_file.unlink()
+    save_checkpoint(meta_file, dict(meta, complete=False))
+
+    n_lines = n_shards = 0
+    with open(input_file, "r", encoding="utf-8") as f:
+        for n_shards, lines in enumerate(batched(f, shard_size), 1):
+            n_lines += len(lines)
+            shard_file = docs_dir / f"shard-{n_shards - 1:05d}.spacy"
+            if shard_file.is_file():
+                continue
+            docs = chain.from_iterable(
+                parse_docs(chunk, nlp) for chunk in batched(lines, SORT_WINDOW)
+            )
+            doc_bin = DocBin(store_user_data=True, docs=docs)
+            tmp_file = shard_file.with_suffix(".tmp")
+            doc_bin.to_disk(tmp_file)
+            os.replace(tmp_file, shard_file)
+            logger.info(f"Parsed {n_lines} lines into {shard_file}.")
+
+    save_checkpoint(
+        meta_file, dict(meta, n_lines=n_lines, n_shards=n_shards, complete=True)
+    )
+    return n_lines, n_shards
+
+
+def _init_match_worker(model_name: str, matcher_name: str = "token") -> None:
+    """Load the tokenizer once per match worker process."""
+    global nlp, suru_token, matcher
+    nlp, suru_token = load_tokenizer(model_name)
+    matcher = MATCHERS[matcher_name]
+
+
+def _match_shard(
+    shard_file: Path, part_file: Path, corpus_name: str, batch_size: int
+) -> Tuple[int, int]:
+    """Run the matcher on the parses of one shard and write them to a part file."""
+    from spacy.tokens import DocBin  # type: ignore
+
+    docs = DocBin().from_disk(shard_file).get_docs(nlp.vocab)
+    with open(part_file, "wb") as out:
+        return write_match_stream(
+            (matcher(doc, suru_token) for doc in docs),
+            out,
+            corpus_name,
+            batch_size,
+        )
+
+
+def match_docs(
+    docs_dir: Path,
+    output_file: Path,
+    corpus_name: str,
+    model_name: str,
+    workers: int = 1,
+    batch_size: int = 10000,
+    matcher_name: str = "token",
+) -> Tuple[int, int]:
+    """
+    Run the matcher on saved parses and save the patterns as CSV.
+
+    Only the tokenizer of the model is loaded. Shards are matched in parallel
+    by `workers` processes into part files that are merged in shard order, so
+    the output is identical to that of extracting from the corpus directly.
+
+    Args:
+        docs_dir (Path): Directory of the shards written by `parse_corpus`.
+        output_file (Path): The path of the CSV file to write.
+        corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        model_name (str): The name of the model used for parsing.
+        workers (int): Number of worker processes.
+        batch_size (int): Number of patterns buffered before each write.
+        matcher_name (str): Name of the matcher in `MATCHERS`.
+
+    Returns:
+        Tuple[int, int]: The number of lines matched and patterns extracted.
+    """
+    meta = load_checkpoint(docs_dir / "meta.json")
+    if not meta or not meta.get("complete"):
+        raise ValueError(f"{docs_dir} does not contain a completed parse.")
+
+    shard_files = [docs_dir / f"shard-{i:05d}.spacy" for i in range(meta["n_shards"])]
+    parts_dir = output_file.with_suffix(".parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    part_files = [parts_dir / f"part-{i:05d}.csv" for i in range(len(shard_files))]
+
+    shard_args = (
+        shard_files,
+        part_files,
+        [corpus_name] * len(shard_files),
+        [batch_size] * len(shard_files),
+    )
+    logger.info(f"Matching {len(shard_files)} shards with {workers} workers.")
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(shard_files)) or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_match_worker,
+            initargs=(model_name, matcher_name),
+        ) as executor:
+            counts = list(executor.map(_match_shard, *shard_args))
+    else:
+        _init_match_worker(model_name, matcher_name)
+        counts = list(map(_match_shard, *shard_args))
+
+    if part_files:
+        merge_parts(part_files, output_file)
+    else:
+        with open(output_file, "wb") as out:
+            write_results([], out, corpus_name)
+    shutil.rmtree(parts_dir)
+    return sum(n for n, _ in counts), sum(m for _, m in counts)
+
+
+# The model of this process, loaded by `main`, `run_parse` or the worker
+# initializers on first use.
+nlp: Optional["spacy.language.Language"] = None
+suru_token: Optional["Token"] = None
+parse_cache: Optional[ParseCache] = None
+matcher: Matcher = npv_matcher
 
 
 def main(
@@ -256,57 +1522,346 @@ def main(
     data_dir: Path,
     model_name: Optional[str] = None,
     corpus_name: str = "Unknown",
+    workers: int = 1,
+    seed: int = 42,
+    batch_size: int = 10000,
+    cache_dir: Optional[Path] = None,
+    cache_max_bytes: int = 4 << 30,
+    output_format: str = "csv",
+    aggregate: bool = False,
+    matcher_name: str = "token",
+    report_file: Optional[Path] = None,
+    profile_file: Optional[Path] = None,
 ) -> None:
     """
     Main function to process a corpus file and save results.
 
+    The corpus is read lazily and patterns are written in batches as they are
+    extracted, so memory use stays flat regardless of the input size. Each
+    batch is committed together with a checkpoint, so rerunning the same
+    command after an interruption resumes from the last committed batch.
+
+    With `report_file`, the run is instrumented (see
+    `instrumentation.Instrumentation`) and the report is written to it as
+    JSON. Without it, no time is measured and nothing is counted.
+
     Args:
         input_file (Path): The path to the input corpus file.
         data_dir (Path): Directory to save the output file.
         model_name (Optional[str]): The name of the spaCy model to use.
         corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        workers (int): Number of worker processes; 1 processes in this process.
+        seed (int): Random seed set in worker processes.
+        batch_size (int): Number of patterns buffered before each write.
+        cache_dir (Optional[Path]): Directory of the parse cache, or None to disable it.
+        cache_max_bytes (int): Size cap of the parse cache.
+        output_format (str): One of 'csv', 'parquet' or 'arrow'; see `convert_results`.
+        aggregate (bool): Whether to aggregate patterns into frequencies.
+        matcher_name (str): Name of the matcher in `MATCHERS`: 'token' for
+            `npv_matcher`, 'array' for `npv_matcher_array`.
+        report_file (Optional[Path]): JSON file to write the instrumentation report to.
+        profile_file (Optional[Path]): File to dump the cProfile stats of the
+            run to; with several workers, each shard is profiled next to it.
+    """
+    global nlp, suru_token, parse_cache
+    used_model = model_name if model_name else default_model_name()
+    output_file = data_dir / f"{corpus_name}_npvs_{used_model}.csv"
+    run_info = {
+        "input_sha256": file_sha256(input_file),
+        "model": used_model,
+        "version": code_version(),
+    }
+    run = (
+        instrumentation.Instrumentation(
+            dict(run_info, corpus=corpus_name, workers=workers, matcher=matcher_name)
+        )
+        if report_file
+        else None
+    )
+
+    with instrumentation.recording(run, profile_file):
+        if workers > 1:
+            n_lines, n_results = process_corpus_parallel(
+                input_file,
+                output_file,
+                corpus_name,
+                model_name,
+                workers,
+                run_info,
+                seed,
+                batch_size,
+                cache_dir,
+                cache_max_bytes,
+                matcher_name,
+                profile_file,
+            )
+            instrumentation.progress(n_lines, n_results)
+        else:
+            with instrumentation.stage("load_model"):
+                nlp, suru_token = load_nlp_model(model_name)
+            parse_cache = open_parse_cache(cache_dir, used_model, nlp, cache_max_bytes)
+
+            n_lines, n_results = extract_range(
+                input_file,
+                0,
+                None,
+                output_file,
+                corpus_name,
+                nlp,
+                suru_token,
+                run_info,
+                batch_size,
+                parse_cache,
+                MATCHERS[matcher_name],
+            )
+            checkpoint_path(output_file).unlink()
+            if parse_cache:
+                parse_cache.log_stats()
+
+        if output_format != "csv" or aggregate:
+            with instrumentation.stage("convert"):
+                output_file = convert_results(output_file, output_format, aggregate)
+
+    if run and report_file:
+        run.write_report(report_file)
+
+    logger.info(f"Processed {n_lines} lines.")
+    logger.info(f"Extracted {n_results} NPV patterns.")
+    logger.info(f"Results saved to {output_file}")
+
+
+def run_parse(
+    input_file: Path,
+    data_dir: Path,
+    model_name: Optional[str] = None,
+    corpus_name: str = "Unknown",
+    shard_size: int = 10000,
+) -> None:
+    """
+    Parse a corpus file and save the parses for later matching with `run_match`.
+
+    Args:
+        input_file (Path): The path to the input corpus file.
+        data_dir (Path): Directory to save the parses in.
+        model_name (Optional[str]): The name of the spaCy model to use.
+        corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        shard_size (int): Number of lines per `DocBin` shard.
     """
     global nlp, suru_token
+    nlp, suru_token = load_nlp_model(model_name)
     used_model = model_name if model_name else nlp.meta["name"]
-    if model_name:
-        nlp, suru_token = load_nlp_model(model_name)
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        corpus = f.readlines()
+    docs_dir = docs_dir_path(data_dir, corpus_name, used_model)
+    n_lines, n_shards = parse_corpus(input_file, docs_dir, nlp, used_model, shard_size)
 
-    results = process_corpus(corpus, nlp, suru_token)
-    save_results(results, data_dir, corpus_name, used_model)
+    logger.info(f"Parsed {n_lines} lines into {n_shards} shards in {docs_dir}")
 
-    logger.info(f"Processed {len(corpus)} lines.")
-    logger.info(f"Extracted {len(results)} NPV patterns.")
-    logger.info(f"Results saved to {data_dir}/{corpus_name}_npvs_{used_model}.csv")
+
+def run_match(
+    data_dir: Path,
+    model_name: str,
+    corpus_name: str = "Unknown",
+    workers: int = 1,
+    batch_size: int = 10000,
+    output_format: str = "csv",
+    aggregate: bool = False,
+    matcher_name: str = "token",
+) -> None:
+    """
+    Match NPV patterns on parses saved by `run_parse` and save results.
+
+    Args:
+        data_dir (Path): Directory containing the parses and receiving the output file.
+        model_name (str): The name of the spaCy model used for parsing.
+        corpus_name (str): The name of the corpus ('ted' or 'jnlp').
+        workers (int): Number of worker processes, each matching whole shards.
+        batch_size (int): Number of patterns buffered before each write.
+        output_format (str): One of 'csv', 'parquet' or 'arrow'; see `convert_results`.
+        aggregate (bool): Whether to aggregate patterns into frequencies.
+        matcher_name (str): Name of the matcher in `MATCHERS`.
+    """
+    docs_dir = docs_dir_path(data_dir, corpus_name, model_name)
+    output_file = data_dir / f"{corpus_name}_npvs_{model_name}.csv"
+    n_lines, n_results = match_docs(
+        docs_dir,
+        output_file,
+        corpus_name,
+        model_name,
+        workers,
+        batch_size,
+        matcher_name,
+    )
+    if output_format != "csv" or aggregate:
+        output_file = convert_results(output_file, output_format, aggregate)
+
+    logger.info(f"Matched {n_lines} lines.")
+    logger.info(f"Extracted {n_results} NPV patterns.")
+    logger.info(f"Results saved to {output_file}")
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Extract NPV patterns from a corpus.")
-    parser.add_argument(
-        "--input-file", type=Path, required=True, help="Path to the input corpus file"
+    parser = argparse.ArgumentParser(
+        description="Extract NPV patterns from a corpus.",
+        epilog="Without a command, parses and matches in one pass (same as 'extract'). "
+        "The 'parse' and 'match' commands split this into a parse stage that saves "
+        "DocBin shards and a match stage that can be rerun on them without reparsing.",
     )
-    parser.add_argument(
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
         "--data-dir",
         type=Path,
         required=True,
         help="Directory to save the output CSV file",
     )
-    parser.add_argument("--model", type=str, help="Name of the spaCy model to use")
-    parser.add_argument(
+    common.add_argument(
         "--corpus-name", type=str, default="Unknown", help="Name of the corpus"
     )
-    parser.add_argument(
+    common.add_argument(
         "--seed",
         type=int,
         default=42,
         help="Random seed for reproducibility (default: 42)",
     )
+    input_file = argparse.ArgumentParser(add_help=False)
+    input_file.add_argument(
+        "--input-file", type=Path, required=True, help="Path to the input corpus file"
+    )
+    writing = argparse.ArgumentParser(add_help=False)
+    writing.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes; extraction splits the input into line-range shards, matching distributes the DocBin shards (default: 1)",
+    )
+    writing.add_argument(
+        "--format",
+        choices=list(RESULT_SUFFIXES),
+        default="csv",
+        help="Output file format; parquet and arrow (Arrow IPC) store strings dictionary-encoded (default: csv)",
+    )
+    writing.add_argument(
+        "--aggregate",
+        action="store_true",
+        help="Aggregate identical patterns into a frequency column when writing",
+    )
+    writing.add_argument(
+        "--matcher",
+        choices=list(MATCHERS),
+        default="token",
+        help="NPV matcher: 'token' walks the tokens, 'array' checks the match conditions on Doc.to_array columns; both give identical output (default: token)",
+    )
+    writing.add_argument(
+        "--write-batch-size",
+        type=int,
+        default=10000,
+        help="Number of extracted patterns buffered in memory before each write to the output file (default: 10000)",
+    )
+
+    commands = parser.add_subparsers(dest="command")
+    extract_parser = commands.add_parser(
+        "extract",
+        parents=[common, input_file, writing],
+        help="Parse a corpus and extract NPV patterns (default)",
+    )
+    extract_parser.add_argument(
+        "--model", type=str, help="Name of the spaCy model to use"
+    )
+    extract_parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Directory of the on-disk parse/match cache (default: DATA_DIR/cache)",
+    )
+    extract_parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=4096,
+        help="Size cap of the parse/match cache in MiB; least recently used entries are evicted beyond it (default: 4096)",
+    )
+    extract_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse and match every line without reading or writing the cache",
+    )
+    extract_parser.add_argument(
+        "--report",
+        type=Path,
+        help="Instrument the run and write a JSON report of stage and pipeline component times, throughput, peak memory and normalization failures to this file",
+    )
+    extract_parser.add_argument(
+        "--profile",
+        type=Path,
+        help="Profile the run with cProfile and dump the stats to this file (with --workers, one file per shard next to it)",
+    )
+    parse_parser = commands.add_parser(
+        "parse",
+        parents=[common, input_file],
+        help="Parse a corpus and save the parses as DocBin shards in DATA_DIR/{corpus}_docs_{model}",
+    )
+    parse_parser.add_argument(
+        "--model", type=str, help="Name of the spaCy model to use"
+    )
+    parse_parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=10000,
+        help="Number of lines per DocBin shard (default: 10000)",
+    )
+    match_parser = commands.add_parser(
+        "match",
+        parents=[common, writing],
+        help="Extract NPV patterns from parses saved by the parse command",
+    )
+    match_parser.add_argument(
+        "--model",
+        type=str,
+        required=True,
+        help="Name of the spaCy model used by the parse command",
+    )
 
-    args = parser.parse_args()
+    argv = sys.argv[1:]
+    if argv and argv[0] not in commands.choices and argv[0] not in {"-h", "--help"}:
+        argv = ["extract", *argv]
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        sys.exit(2)
 
     set_random_seed(args.seed)
     logger.info(f"Random seed set to {args.seed}")
 
-    main(args.input_file, args.data_dir, args.model, args.corpus_name)
+    if args.command == "parse":
+        run_parse(
+            args.input_file,
+            args.data_dir,
+            args.model,
+            args.corpus_name,
+            args.shard_size,
+        )
+    elif args.command == "match":
+        run_match(
+            args.data_dir,
+            args.model,
+            args.corpus_name,
+            args.workers,
+            args.write_batch_size,
+            args.format,
+            args.aggregate,
+            args.matcher,
+        )
+    else:
+        main(
+            args.input_file,
+            args.data_dir,
+            args.model,
+            args.corpus_name,
+            args.workers,
+            args.seed,
+            args.write_batch_size,
+            None if args.no_cache else args.cache_dir or args.data_dir / "cache",
+            args.cache_size << 20,
+            args.format,
+            args.aggregate,
+            args.matcher,
+            args.report,
+            args.profile,
+        )
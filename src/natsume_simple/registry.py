@@ -0,0 +1,238 @@
+import gc
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from natsume_simple.database import (
+    Snapshot,
+    discover_datasets,
+    load_snapshot,
+    snapshot_size,
+    source_version,
+)
+from natsume_simple.log import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class SnapshotRegistry:
+    """Lazily loaded snapshots of every model with results in a data directory.
+
+    A model's snapshot is loaded on its first request. When the estimated heap
+    size of the loaded snapshots exceeds `memory_budget`, the least recently
+    used ones are evicted, so memory grows with the models in use rather than
+    with the models on disk. The most recently used snapshot is always kept.
+    Tables memory mapped from a prebuilt database file are left to the page
+    cache and do not count against the budget, see `snapshot_size`.
+
+    Snapshots are immutable: loading, reloading and evicting only replace
+    references, so requests holding a snapshot keep using it undisturbed.
+
+    Examples:
+        >>> import tempfile
+        >>> import polars as pl
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     for model in ["a", "b"]:
+        ...         pl.DataFrame({"n": ["本"], "p": ["を"], "v": ["読む"], "corpus": ["ted"]}
+        ...         ).write_csv(Path(d) / f"ted_npvs_{model}.csv")
+        ...     changed = []
+        ...     registry = SnapshotRegistry(Path(d), memory_budget=1, on_change=changed.append)
+        ...     registry.available()
+        ...     registry.get("a").index.noun("本").height
+        ...     _ = registry.get("b")
+        ...     list(registry.snapshots), changed
+        ...     registry.reload("b"), registry.reload("a")
+        ...     changed
+        {'a': ['ted'], 'b': ['ted']}
+        1
+        (['b'], ['a'])
+        ('reloaded', 'not loaded')
+        ['a', 'b']
+    """
+
+    def __init__(
+        self,
+        data_dir: Path = Path("data"),
+        memory_budget: int = 2 << 30,
+        on_change: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Create an empty registry.
+
+        Args:
+            data_dir (Path): Directory containing database files and extraction results.
+            memory_budget (int): Estimated heap bytes the loaded snapshots may hold.
+            on_change (Optional[Callable[[str], None]]): Called with the model name
+                after its snapshot was replaced or evicted.
+        """
+        self.data_dir = data_dir
+        self.memory_budget = memory_budget
+        self.on_change = on_change
+        self.snapshots: OrderedDict[str, Snapshot] = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.load_locks: Dict[str, threading.Lock] = {}
+
+    def available(self) -> Dict[str, List[str]]:
+        """Return every model on disk with the corpora it has results for."""
+        return discover_datasets(self.data_dir)
+
+    def _load_lock(self, model_name: str) -> threading.Lock:
+        with self.lock:
+            return self.load_locks.setdefault(model_name, threading.Lock())
+
+    def get(self, model_name: str) -> Snapshot:
+        """
+        Return the snapshot of a model, loading it on first use.
+
+        Args:
+            model_name (str): Name of the spaCy model used for extraction.
+
+        Returns:
+            Snapshot: The current snapshot of the model.
+
+        Raises:
+            KeyError: If there is no data for the model.
+        """
+        with self.lock:
+            snapshot = self.snapshots.get(model_name)
+            if snapshot is not None:
+                self.snapshots.move_to_end(model_name)
+                return snapshot
+        with self._load_lock(model_name):
+            # Another request may have loaded the model while we waited.
+            with self.lock:
+                snapshot = self.snapshots.get(model_name)
+            if snapshot is None:
+                if model_name not in self.available():
+                    raise KeyError(model_name)
+                start = time.perf_counter()
+                snapshot = load_snapshot(model_name, self.data_dir)
+                self._store(snapshot)
+                logger.info(
+                    f"Loaded the {model_name} database in {time.perf_counter() - start:.2f}s."
+                )
+            return snapshot
+
+    def preload(self, model_name: str) -> threading.Thread:
+        """
+        Load the snapshot of a model in a background thread.
+
+        Requests for the model made in the meantime wait for this load rather
+        than starting their own, so startup does not have to wait for it.
+
+        Args:
+            model_name (str): Name of the spaCy model used for extraction.
+
+        Returns:
+            threading.Thread: The started loading thread.
+        """
+
+        def load() -> None:
+            try:
+                self.get(model_name)
+            except KeyError:
+                logger.warning(f"No data for the {model_name} database.")
+
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def _store(self, snapshot: Snapshot) -> None:
+        evicted = []
+        with self.lock:
+            replaced = snapshot.model_name in self.snapshots
+            self.snapshots[snapshot.model_name] = snapshot
+            self.snapshots.move_to_end(snapshot.model_name)
+            self.sizes[snapshot.model_name] = snapshot_size(snapshot)
+            while (
+                sum(self.sizes.values()) > self.memory_budget
+                and len(self.snapshots) > 1
+            ):
+                model_name, _ = self.snapshots.popitem(last=False)
+                del self.sizes[model_name]
+                evicted.append(model_name)
+        for model_name in evicted:
+            logger.info(f"Evicted the {model_name} database.")
+        changed = [snapshot.model_name, *evicted] if replaced else evicted
+        if self.on_change is not None:
+            for model_name in changed:
+                self.on_change(model_name)
+        # Release the replaced and evicted snapshots once no request holds them.
+        if changed:
+            gc.collect()
+
+    def reload(self, model_name: str, background: bool = False) -> str:
+        """
+        Rebuild the snapshot of a loaded model and swap it in for the current one.
+
+        The current snapshot keeps serving requests while the new one is
+        built. A failed reload keeps the current snapshot.
+
+        Args:
+            model_name (str): Name of the spaCy model used for extraction.
+            background (bool): Whether to rebuild in a background thread and
+                return at once.
+
+        Returns:
+            str: 'not loaded' if the model has no snapshot to replace,
+            'already reloading' if it is being loaded, and otherwise
+            'reloading' in the background, or 'reloaded' or 'failed'.
+
+        Raises:
+            KeyError: If there is no data for the model.
+        """
+        if model_name not in self.snapshots:
+            if model_name not in self.available():
+                raise KeyError(model_name)
+            return "not loaded"
+        load_lock = self._load_lock(model_name)
+        if not load_lock.acquire(blocking=False):
+            return "already reloading"
+        if background:
+            threading.Thread(
+                target=self._reload, args=(model_name, load_lock), daemon=True
+            ).start()
+            return "reloading"
+        return self._reload(model_name, load_lock)
+
+    def _reload(self, model_name: str, load_lock: threading.Lock) -> str:
+        """Rebuild the snapshot of a model, releasing its acquired load lock."""
+        try:
+            # The model may have been evicted while the lock was acquired.
+            if model_name not in self.snapshots:
+                return "not loaded"
+            start = time.perf_counter()
+            self._store(load_snapshot(model_name, self.data_dir))
+            logger.info(
+                f"Reloaded the {model_name} database in {time.perf_counter() - start:.2f}s."
+            )
+            return "reloaded"
+        except Exception:
+            logger.exception(f"Reloading the {model_name} database failed.")
+            return "failed"
+        finally:
+            load_lock.release()
+
+    def reloading(self) -> List[str]:
+        """Return the models that are being loaded or reloaded."""
+        with self.lock:
+            return [name for name, lock in self.load_locks.items() if lock.locked()]
+
+    def watch(self, interval: float) -> None:
+        """Reload loaded models when their source files change, polling every `interval` s."""
+        while True:
+            time.sleep(interval)
+            for model_name, snapshot in list(self.snapshots.items()):
+                if source_version(model_name, self.data_dir) != snapshot.version:
+                    self.reload(model_name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the loaded models with their estimated sizes and the budget."""
+        with self.lock:
+            return {
+                "loaded": dict(self.sizes),
+                "memory_budget": self.memory_budget,
+            }
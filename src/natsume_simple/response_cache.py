@@ -0,0 +1,93 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class ResponseCache:
+    """Bounded in-process cache of serialized responses with LRU eviction.
+
+    Values are serialized responses, such as JSON bytes, so a hit is returned
+    as is, without converting rows to Python objects or encoding them again.
+    When more than `max_entries` responses are cached, the least recently used
+    one is evicted. Lookups are thread-safe, as FastAPI runs endpoints in a thread pool.
+
+    Examples:
+        >>> cache = ResponseCache(max_entries=2)
+        >>> cache.get_or_compute("a", lambda: b"1")
+        b'1'
+        >>> cache.get_or_compute("a", lambda: b"changed")
+        b'1'
+        >>> _ = cache.get_or_compute("b", lambda: b"2")
+        >>> _ = cache.get_or_compute("c", lambda: b"3")
+        >>> cache.get("a") is None, cache.get("b")
+        (True, b'2')
+        >>> cache.stats()
+        {'entries': 2, 'max_entries': 2, 'hits': 2, 'misses': 4, 'evictions': 1}
+        >>> cache.clear()
+        >>> cache.get("b") is None
+        True
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Create an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of cached responses; 0 disables caching.
+        """
+        self.max_entries = max_entries
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.counts: Counter[str] = Counter()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, variable: str = "NATSUME_RESPONSE_CACHE_SIZE") -> "ResponseCache":
+        """Create a cache sized by an environment variable (default: 1024 entries)."""
+        return cls(int(os.environ.get(variable, 1024)))
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached response for `key`, marking it as recently used."""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.counts["misses"] += 1
+            else:
+                self.counts["hits"] += 1
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Cache a response, evicting the least recently used one if full."""
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counts["evictions"] += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached response for `key`, computing and caching it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop all cached responses, e.g. after the database was reloaded."""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of cached responses and the hit/miss counters."""
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.counts["hits"],
+                "misses": self.counts["misses"],
+                "evictions": self.counts["evictions"],
+            }
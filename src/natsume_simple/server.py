@@ -5,14 +5,40 @@
 # ]
 # ///
 
-from collections import Counter
-from typing import Any, Dict, List
+import gzip
+import io
+import json
+import os
+import secrets
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 import polars as pl  # type: ignore
-from fastapi import FastAPI  # type: ignore
+from fastapi import (  # type: ignore
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore
 from fastapi.staticfiles import StaticFiles  # type: ignore
 
+from natsume_simple.database import Snapshot, select_rows
+from natsume_simple.registry import SnapshotRegistry
+from natsume_simple.response_cache import ResponseCache
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    try:
+        import brotlicffi as brotli  # type: ignore
+    except ImportError:
+        brotli = None
+
 app = FastAPI()
 
 app.add_middleware(
@@ -24,103 +50,278 @@ app.add_middleware(
 )
 
 
-def load_database(model_name: str) -> pl.DataFrame:
-    db = pl.read_csv(f"data/ted_npvs_{model_name}.csv")
-    db = db.vstack(pl.read_csv(f"data/jnlp_npvs_{model_name}.csv"))
-    return db.group_by(db.columns).agg(pl.len().alias("frequency"))
+default_model = "ja_ginza_bert_large"
+data_dir = Path("data")
+response_cache = ResponseCache.from_env()
+
+# Snapshots are loaded on first use and evicted beyond the memory budget.
+# Response cache keys include the snapshot version, so stale entries are never
+# hit; the cache is still cleared on a change to release their memory. The
+# default model is loaded in the background, so that importing this module,
+# and thus server startup, does not wait for it.
+registry = SnapshotRegistry(
+    data_dir,
+    memory_budget=int(os.environ.get("NATSUME_MEMORY_BUDGET_MB", 2048)) << 20,
+    on_change=lambda _: response_cache.clear(),
+)
+registry.preload(default_model)
+
+# POST /admin/reload rebuilds whole snapshots, so it is only served to
+# clients presenting this token, and disabled if none is configured.
+reload_token = os.environ.get("NATSUME_RELOAD_TOKEN")
+
+reload_interval = float(os.environ.get("NATSUME_RELOAD_INTERVAL", 0))
+if reload_interval > 0:
+    threading.Thread(
+        target=registry.watch, args=(reload_interval,), daemon=True
+    ).start()
+
 
+def get_snapshot(model: str = Query(default_model)) -> Snapshot:
+    """Snapshot of the model named by the `model` query parameter."""
+    try:
+        return registry.get(model)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No data for model {model}")
 
-def calculate_corpus_norm(db: pl.DataFrame) -> Dict[str, float]:
-    """Calculate normalization factors for different corpora.
+
+JSON = "application/json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+# Bodies smaller than this are sent uncompressed.
+COMPRESS_MIN_SIZE = 1024
+
+
+class EncodedBody(NamedTuple):
+    content: bytes
+    media_type: str
+    encoding: Optional[str]
+
+
+def encoding_weights(header: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into the quality value of each coding.
 
     Args:
-        db: DataFrame containing corpus frequencies
+        header: Value of the Accept-Encoding header
 
     Returns:
-        Dictionary mapping corpus names to their normalization factors
+        Dictionary mapping each listed coding, in lower case, to its q value
+        (1 if none is given, 0 if it is malformed)
 
     Examples:
-        >>> import polars as pl
-        >>> df = pl.DataFrame({
-        ...     "corpus": ["ted", "ted", "jnlp", "jnlp", "jnlp"],
-        ...     "frequency": [1, 2, 3, 2, 1]
-        ... })
-        >>> norms = calculate_corpus_norm(df)
-        >>> norms["ted"] == 1.0  # ted has lower total frequency
-        True
-        >>> norms["jnlp"] == 0.5  # jnlp has double the frequency
-        True
+        >>> encoding_weights("br;q=0, gzip")
+        {'br': 0.0, 'gzip': 1.0}
+        >>> encoding_weights("GZIP; q=0.5, *;q=0.1")
+        {'gzip': 0.5, '*': 0.1}
     """
-    corpus_freqs = {
-        corpus: db.filter(pl.col("corpus") == corpus)["frequency"].sum()
-        for corpus in db["corpus"].unique()
-    }
-    min_count = min(corpus_freqs.values())
-    return {corpus: min_count / frequency for corpus, frequency in corpus_freqs.items()}
-
-
-model_name = "ja_ginza_bert_large"
-db = load_database(model_name)
-corpus_norm = calculate_corpus_norm(db)
+    weights = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    return weights
+
+
+def negotiate(request: Request, arrow: bool = False) -> Tuple[str, Optional[str]]:
+    """Choose the media type from Accept and the compression from Accept-Encoding.
+
+    Of the supported codings, the one with the highest q value is chosen, br
+    before gzip on equal values. Codings with a q value of 0 are never used.
 
+    Args:
+        request: Incoming request
+        arrow: Whether the endpoint can respond with an Arrow IPC stream
 
-@app.get("/corpus/norm")
-def get_corpus_norm() -> Dict[str, float]:
-    return corpus_norm
+    Returns:
+        Tuple of the media type and 'br', 'gzip' or None
+    """
+    media_type = JSON
+    if arrow and ARROW_STREAM in request.headers.get("accept", ""):
+        media_type = ARROW_STREAM
+    weights = encoding_weights(request.headers.get("accept-encoding", ""))
+    default = weights.get("*", 0.0)
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    # The first of equally weighted codings is chosen, so br wins ties.
+    encoding = max(supported, key=lambda coding: weights.get(coding, default))
+    if weights.get(encoding, default) > 0:
+        return media_type, encoding
+    return media_type, None
+
+
+def encode_body(
+    content: bytes, media_type: str, encoding: Optional[str]
+) -> EncodedBody:
+    """Compress a serialized body with the negotiated encoding, if worthwhile."""
+    if encoding is None or len(content) < COMPRESS_MIN_SIZE:
+        return EncodedBody(content, media_type, None)
+    if encoding == "br":
+        return EncodedBody(brotli.compress(content, quality=4), media_type, encoding)
+    return EncodedBody(gzip.compress(content, compresslevel=6), media_type, encoding)
+
+
+def serialize_frame(df: pl.DataFrame, media_type: str) -> bytes:
+    """Serialize a frame in Rust, as a JSON array of rows or an Arrow IPC stream."""
+    if media_type == ARROW_STREAM:
+        buffer = io.BytesIO()
+        df.write_ipc_stream(buffer, compat_level=pl.CompatLevel.oldest())
+        return buffer.getvalue()
+    return df.write_json().encode("utf-8")
+
+
+def encoded_response(body: EncodedBody) -> Response:
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if body.encoding is not None:
+        headers["Content-Encoding"] = body.encoding
+    return Response(content=body.content, media_type=body.media_type, headers=headers)
+
+
+def frame_response(
+    request: Request, key: Tuple, lookup: Callable[[], pl.DataFrame]
+) -> Response:
+    media_type, encoding = negotiate(request, arrow=True)
+    return encoded_response(
+        response_cache.get_or_compute(
+            (*key, media_type, encoding),
+            lambda: encode_body(
+                serialize_frame(lookup(), media_type), media_type, encoding
+            ),
+        )
+    )
 
 
-@app.get("/npv/noun/{noun}")
-def read_npv_noun(noun: str) -> List[Dict[str, Any]]:
-    matches = db.filter(pl.col("n") == noun).drop("n").to_dicts()
-    return matches
+class RowSelection(NamedTuple):
+    limit: Optional[int]
+    offset: int
+    min_frequency: int
+    particle: Optional[str]
+    corpora: Optional[Tuple[str, ...]]
+
+
+def row_selection(
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    min_frequency: int = Query(1, ge=1),
+    particle: Optional[str] = None,
+    corpus: Optional[List[str]] = Query(None),
+) -> RowSelection:
+    """Query parameters filtering and paging npv rows, see `select_rows`."""
+    return RowSelection(
+        limit,
+        offset,
+        min_frequency,
+        particle,
+        tuple(sorted(corpus)) if corpus else None,
+    )
 
 
-@app.get("/npv/verb/{verb}")
-def read_npv_verb(verb: str) -> List[Dict[str, Any]]:
-    matches = db.filter(pl.col("v") == verb).drop("v").to_dicts()
-    return matches
+@app.get("/models")
+def get_models() -> Dict[str, List[str]]:
+    return registry.available()
 
 
-# @app.get("/search/{query}")
-# def read_query(query:str) -> List[tuple[str, str]]:
-#     matches = db.select(
-#         pl.col('n').str.starts_with(query),
-#         pl.col('frequency')
-#     ).sort('frequency', descending=True).itertuples()
+@app.get("/corpus/norm")
+def get_corpus_norm(current: Snapshot = Depends(get_snapshot)) -> Dict[str, float]:
+    return current.corpus_norm
+
+
+@app.post("/admin/reload", status_code=202)
+def post_reload(
+    model: Optional[str] = None, authorization: Optional[str] = Header(None)
+) -> Dict[str, str]:
+    if not reload_token:
+        raise HTTPException(
+            status_code=403, detail="Reloading is disabled; set NATSUME_RELOAD_TOKEN"
+        )
+    if not secrets.compare_digest(authorization or "", f"Bearer {reload_token}"):
+        raise HTTPException(status_code=401, detail="Invalid reload token")
+    status = {}
+    for model_name in [model] if model else list(registry.snapshots):
+        try:
+            status[model_name] = registry.reload(model_name, background=True)
+        except KeyError:
+            raise HTTPException(
+                status_code=404, detail=f"No data for model {model_name}"
+            )
+    return status
+
+
+@app.get("/admin/status")
+def get_status() -> Dict[str, Any]:
+    return {
+        "default_model": default_model,
+        "available": registry.available(),
+        "reloading": registry.reloading(),
+        **registry.stats(),
+    }
 
-#     return matches
 
-#     # str.startswith
-#     # [("aa", "v"), ("ab", "n"), (...)]
+@app.get("/cache/stats")
+def get_cache_stats() -> Dict[str, int]:
+    return response_cache.stats()
 
 
-@app.get("/search/{query}")
-def read_query(query: str) -> List[tuple[str, str]]:
-    # Filter rows containing the query
-    matches = (
-        db.filter(pl.col("n").str.contains(query) | pl.col("v").str.contains(query))
-        .select(["n", "v"])
-        .to_dicts()
+@app.get("/npv/noun/{noun}")
+def read_npv_noun(
+    noun: str,
+    request: Request,
+    selection: RowSelection = Depends(row_selection),
+    current: Snapshot = Depends(get_snapshot),
+) -> Response:
+    return frame_response(
+        request,
+        (current.version, "noun", noun, selection),
+        lambda: select_rows(
+            current.index.noun(noun), current.corpus_norm, *selection
+        ).drop("n"),
     )
 
-    result = []
 
-    # Iterate through the filtered results
-    for row in matches:
-        # If the query exists in the `n` column, add it to the result list
-        if query in row["n"]:
-            result.append((row["n"], "n"))
-        # If the query exists in the `v` column, add it to the result list
-        if query in row["v"]:
-            result.append((row["v"], "v"))
+@app.get("/npv/verb/{verb}")
+def read_npv_verb(
+    verb: str,
+    request: Request,
+    selection: RowSelection = Depends(row_selection),
+    current: Snapshot = Depends(get_snapshot),
+) -> Response:
+    return frame_response(
+        request,
+        (current.version, "verb", verb, selection),
+        lambda: select_rows(
+            current.index.verb(verb), current.corpus_norm, *selection
+        ).drop("v"),
+    )
 
-    tuple_counts = Counter(result)
 
-    sorted_unique_result = sorted(
-        tuple_counts.keys(), key=lambda x: tuple_counts[x], reverse=True
+@app.get("/search/{query}")
+def read_query(
+    query: str,
+    request: Request,
+    limit: int = Query(10, ge=1),
+    current: Snapshot = Depends(get_snapshot),
+) -> Response:
+    media_type, encoding = negotiate(request)
+    return encoded_response(
+        response_cache.get_or_compute(
+            (current.version, "search", query, limit, encoding),
+            lambda: encode_body(
+                json.dumps(
+                    current.search_index.search(query, limit),
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                ).encode("utf-8"),
+                media_type,
+                encoding,
+            ),
+        )
     )
 
-    return sorted_unique_result
-
 
 app.mount("/", StaticFiles(directory="natsume-frontend/build", html=True), name="app")
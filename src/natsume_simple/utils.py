@@ -1,13 +1,37 @@
+import hashlib
 import random
+from pathlib import Path
 
 import numpy as np  # type: ignore
-import torch  # type: ignore
 
 
 def set_random_seed(seed: int = 42):
-    """Set random seed for reproducibility across multiple libraries."""
+    """Set random seed for reproducibility across multiple libraries.
+
+    torch is imported here rather than at module level, as it takes seconds to
+    import and most callers of this module never need it.
+    """
+    import torch  # type: ignore
+
     random.seed(seed)
     np.random.seed(seed)
     torch.manual_seed(seed)
     if torch.cuda.is_available():
         torch.cuda.manual_seed_all(seed)
+
+
+def file_sha256(path: Path) -> str:
+    """
+    Compute the SHA-256 hex digest of a file's contents.
+
+    Args:
+        path (Path): The path to the file.
+
+    Returns:
+        str: The hex digest.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
@@ -0,0 +1,36 @@
+import pytest
+
+from natsume_simple.data import TED_DATASETS, get_ted_corpus
+
+datasets = pytest.importorskip("datasets")
+
+
+def test_ted_corpus_is_cached(tmp_path, monkeypatch):
+    loaded = []
+
+    def load_dataset(*args, split, **kwargs):
+        name = kwargs.get("year", args[-1])
+        loaded.append(name)
+        return datasets.Dataset.from_dict(
+            {
+                "translation": [
+                    {"en": "a book", "ja": f"{name}の本 "},
+                    {"en": "yes", "ja": "はい"},
+                ]
+            }
+        )
+
+    monkeypatch.setattr(datasets, "load_dataset", load_dataset)
+    corpus = get_ted_corpus(tmp_path)
+    assert sorted(loaded) == ["2014", "2015", "2016", "iwslt2017-ja-en"]
+    assert corpus[:2] == ["2014の本", "はい"]
+    assert len(corpus) == 2 * len(TED_DATASETS)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        f"{name}.arrow" for name, _, _ in TED_DATASETS
+    )
+
+    def offline(*args, **kwargs):
+        raise ConnectionError("datasets.load_dataset called on a cached corpus")
+
+    monkeypatch.setattr(datasets, "load_dataset", offline)
+    assert get_ted_corpus(tmp_path) == corpus
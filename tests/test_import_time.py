@@ -0,0 +1,88 @@
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Cumulative import time budgets in seconds. The modules import in 0.1-0.8 s
+# on a single slow core; the budgets leave room for loaded CI machines.
+IMPORT_BUDGETS = {
+    "natsume_simple.data": 1.5,
+    "natsume_simple.database": 1.5,
+    "natsume_simple.pattern_extraction": 1.5,
+    "natsume_simple.server": 2.0,
+}
+
+# Modules that must only be imported on first use.
+DEFERRED_IMPORTS = {
+    "natsume_simple.data": ["torch", "datasets", "spacy"],
+    "natsume_simple.database": ["torch", "datasets", "spacy"],
+    "natsume_simple.server": ["torch", "datasets", "spacy"],
+    "natsume_simple.pattern_extraction": [
+        "torch",
+        "datasets",
+        "spacy",
+        "ginza",
+        "ja_ginza",
+        "ja_ginza_bert_large",
+    ],
+}
+
+
+def import_times(module: str) -> Dict[str, float]:
+    """Import a module in a fresh interpreter and return the cumulative import
+    time in seconds of every module it imported, from `python -X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def imported_modules(module: str) -> List[str]:
+    """Import a module in a fresh interpreter and return `sys.modules`.
+
+    Unlike `-X importtime`, this also sees modules spaCy imports when loading
+    a model package.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(*sys.modules)"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        check=True,
+    )
+    return result.stdout.split()
+
+
+def skip_without_backend(module: str) -> None:
+    if module == "natsume_simple.server":
+        pytest.importorskip("fastapi")
+
+
+@pytest.mark.parametrize("module", IMPORT_BUDGETS)
+def test_import_time_budget(module):
+    skip_without_backend(module)
+    seconds = import_times(module)[module]
+    assert seconds < IMPORT_BUDGETS[module], f"{module} took {seconds:.2f}s to import"
+
+
+@pytest.mark.parametrize("module", DEFERRED_IMPORTS)
+def test_heavy_imports_deferred(module):
+    skip_without_backend(module)
+    imported = imported_modules(module)
+    assert not [name for name in DEFERRED_IMPORTS[module] if name in imported]
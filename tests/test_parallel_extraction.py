@@ -0,0 +1,25 @@
+from natsume_simple.pattern_extraction import main
+
+# Lines end in "\n", "\r\n" and a lone "\r", which all end a line when the
+# corpus is read in text mode.
+CORPUS = (
+    "本を読む。\n"
+    "友達に会った。\r\n"
+    "ページにある写真を見た。\r"
+    "そこにある本を買う。\n"
+    "駅で電車を待つ。\n"
+    "手紙を書いた。"
+)
+
+
+def test_workers_match_single_process(tmp_path):
+    input_file = tmp_path / "corpus.txt"
+    input_file.write_bytes(CORPUS.encode("utf-8"))
+    outputs = []
+    for workers in [1, 2]:
+        data_dir = tmp_path / f"workers-{workers}"
+        data_dir.mkdir()
+        main(input_file, data_dir, "ja_ginza", "test", workers=workers)
+        outputs.append((data_dir / "test_npvs_ja_ginza.csv").read_bytes())
+    assert outputs[0] == outputs[1]
+    assert "ページ,に,ある" in outputs[0].decode("utf-8")
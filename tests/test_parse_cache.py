@@ -0,0 +1,87 @@
+from natsume_simple.parse_cache import ParseCache
+from natsume_simple.pattern_extraction import (
+    extract_range,
+    load_nlp_model,
+    open_parse_cache,
+)
+
+CORPUS = "本を読む。\n友達に会った。\nそこにある本を買う。\n"
+
+
+def entry_sizes(cache):
+    return dict(cache.conn.execute("SELECT key, size FROM entries"))
+
+
+def test_keys(tmp_path):
+    cache = ParseCache(tmp_path, "ja_ginza", "5.2.0", "1")
+    same = ParseCache(tmp_path, "ja_ginza", "5.2.0", "1")
+    new_model = ParseCache(tmp_path, "ja_ginza", "5.3.0", "1")
+    new_code = ParseCache(tmp_path, "ja_ginza", "5.2.0", "2")
+
+    assert cache.doc_key("文") == same.doc_key("文")
+    assert cache.doc_key("文") != cache.doc_key("別の文")
+    assert cache.doc_key("文") != cache.match_key("文")
+    assert cache.doc_key("文") != new_model.doc_key("文")
+    # Parses do not depend on the extraction code, matches do.
+    assert cache.doc_key("文") == new_code.doc_key("文")
+    assert cache.match_key("文") != new_code.match_key("文")
+
+    cache.put_many({cache.doc_key("文"): b"doc"})
+    assert same.get_many([same.doc_key("文"), same.doc_key("別の文")], "doc") == {
+        same.doc_key("文"): b"doc"
+    }
+    assert new_model.get_many([new_model.doc_key("文")], "doc") == {}
+    assert (same.stats["doc_hits"], same.stats["doc_misses"]) == (1, 1)
+    assert new_model.stats["doc_misses"] == 1
+
+
+def test_total_size_follows_entries(tmp_path):
+    cache = ParseCache(tmp_path, "ja_ginza", "5.2.0", "1", max_bytes=25)
+    cache.put_many({"a": b"1" * 10, "b": b"2" * 10})
+    assert cache.total_size() == 20
+    cache.put_many({"a": b"1" * 3})
+    assert cache.total_size() == 13
+    cache.put_many({"c": b"3" * 20})
+    assert cache.total_size() == sum(entry_sizes(cache).values()) <= 25
+    cache.close()
+    # The total is stored with the entries, so it survives reopening.
+    reopened = ParseCache(tmp_path, "ja_ginza", "5.2.0", "1", max_bytes=25)
+    assert reopened.total_size() == sum(entry_sizes(reopened).values())
+
+
+def test_least_recently_read_entry_is_evicted(tmp_path):
+    cache = ParseCache(tmp_path, "ja_ginza", "5.2.0", "1", max_bytes=30)
+    for key in ["a", "b", "c"]:
+        cache.put_many({key: b"0" * 10})
+    # Reading "a" makes "b" the least recently used entry.
+    assert cache.get_many(["a"], "doc") == {"a": b"0" * 10}
+    cache.put_many({"d": b"0" * 10})
+    assert sorted(entry_sizes(cache)) == ["a", "c", "d"]
+    assert cache.stats["evictions"] == 1
+    cache.put_many({"e": b"0" * 20})
+    assert sorted(entry_sizes(cache)) == ["d", "e"]
+    assert cache.total_size() == 30
+
+
+def test_cached_extraction_matches(tmp_path):
+    input_file = tmp_path / "corpus.txt"
+    input_file.write_text(CORPUS, encoding="utf-8")
+    nlp, suru_token = load_nlp_model("ja_ginza")
+    run_info = {"input_sha256": "", "model": "ja_ginza", "version": "test"}
+
+    outputs, stats = [], []
+    for run in range(2):
+        cache = open_parse_cache(tmp_path / "cache", "ja_ginza", nlp, 1 << 20)
+        output_file = tmp_path / f"run-{run}.csv"
+        extract_range(
+            input_file, 0, None, output_file, "test", nlp, suru_token, run_info,
+            batch_size=1, parse_cache=cache,
+        )  # fmt: skip
+        outputs.append(output_file.read_bytes())
+        stats.append(cache.stats)
+        cache.close()
+
+    assert outputs[0] == outputs[1]
+    assert stats[0]["match_misses"] == 3 and stats[0]["match_hits"] == 0
+    assert stats[1]["match_hits"] == 3
+    assert stats[1]["match_misses"] == stats[1]["doc_misses"] == 0
@@ -0,0 +1,94 @@
+import pytest
+
+from natsume_simple import pattern_extraction
+from natsume_simple.pattern_extraction import checkpoint_path, main
+
+CORPUS = (
+    "本を読む。\n"
+    "友達に会った。\n"
+    "ページにある写真を見た。\n"
+    "そこにある本を買う。\n"
+    "駅で電車を待つ。\n"
+    "手紙を書いた。\n"
+)
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def rows_written(monkeypatch):
+    """Count the pattern rows written, and interrupt the run after `limit` rows.
+
+    The interrupting batch is written before the error is raised, so the
+    partial file ends in output that was never committed to the checkpoint.
+    """
+    write_results = pattern_extraction.write_results
+    state = {"rows": 0, "limit": None}
+
+    def interrupting_write_results(results, f, *args, **kwargs):
+        write_results(results, f, *args, **kwargs)
+        state["rows"] += len(results)
+        if state["limit"] is not None and state["rows"] >= state["limit"]:
+            state["limit"] = None
+            raise Interrupted
+
+    monkeypatch.setattr(pattern_extraction, "write_results", interrupting_write_results)
+    return state
+
+
+def extract(input_file, data_dir):
+    main(input_file, data_dir, "ja_ginza", "test", batch_size=1)
+    return (data_dir / "test_npvs_ja_ginza.csv").read_bytes()
+
+
+def interrupt(input_file, data_dir, rows_written, limit=2):
+    rows_written.update(rows=0, limit=limit)
+    with pytest.raises(Interrupted):
+        extract(input_file, data_dir)
+    output_file = data_dir / "test_npvs_ja_ginza.csv"
+    assert checkpoint_path(output_file).is_file()
+    assert output_file.with_name(output_file.name + ".partial").is_file()
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "corpus.txt"
+    path.write_text(CORPUS, encoding="utf-8")
+    return path
+
+
+def test_resume_matches_uninterrupted_run(tmp_path, input_file, rows_written):
+    (tmp_path / "full").mkdir()
+    expected = extract(input_file, tmp_path / "full")
+    total_rows = rows_written["rows"]
+
+    data_dir = tmp_path / "resumed"
+    data_dir.mkdir()
+    interrupt(input_file, data_dir, rows_written)
+    rows_written["rows"] = 0
+    assert extract(input_file, data_dir) == expected
+    # Only the rows after the last checkpoint were extracted again.
+    assert 0 < rows_written["rows"] < total_rows
+
+
+@pytest.mark.parametrize("change", ["code_version", "input"])
+def test_stale_checkpoint_is_discarded(
+    tmp_path, input_file, rows_written, monkeypatch, change
+):
+    data_dir = tmp_path / "resumed"
+    data_dir.mkdir()
+    interrupt(input_file, data_dir, rows_written)
+    if change == "code_version":
+        monkeypatch.setattr(pattern_extraction, "code_version", lambda: "changed")
+    else:
+        input_file.write_text(CORPUS + "犬が走る。\n", encoding="utf-8")
+
+    (tmp_path / "full").mkdir()
+    rows_written["rows"] = 0
+    expected = extract(input_file, tmp_path / "full")
+    total_rows = rows_written["rows"]
+    rows_written["rows"] = 0
+    assert extract(input_file, data_dir) == expected
+    assert rows_written["rows"] == total_rows
@@ -0,0 +1,246 @@
+import json
+import os
+from pathlib import Path
+
+import polars as pl
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from natsume_simple import server  # noqa: E402
+from natsume_simple.database import build_database  # noqa: E402
+from natsume_simple.registry import SnapshotRegistry  # noqa: E402
+from natsume_simple.response_cache import ResponseCache  # noqa: E402
+
+TED_ROWS = [
+    ("本", "を", "読む"),
+    ("本", "を", "読む"),
+    ("本", "を", "読む"),
+    ("本", "を", "書く"),
+    ("本", "に", "書く"),
+    ("本", "を", "買う"),
+    ("手紙", "を", "書く"),
+]
+JNLP_ROWS = [("本", "を", "読む"), ("本", "を", "読む"), ("本", "を", "引用する")]
+
+
+def write_results(data_dir: Path, corpus: str, model: str, rows) -> Path:
+    path = data_dir / f"{corpus}_npvs_{model}.csv"
+    path.write_text(
+        "n,p,v,corpus\n" + "".join(f"{n},{p},{v},{corpus}\n" for n, p, v in rows),
+        encoding="utf-8",
+    )
+    return path
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client of the server over a data directory with two models."""
+    for model in ["a", "b"]:
+        write_results(tmp_path, "ted", model, TED_ROWS)
+        write_results(tmp_path, "jnlp", model, JNLP_ROWS)
+    response_cache = ResponseCache(16)
+    registry = SnapshotRegistry(tmp_path, on_change=lambda _: response_cache.clear())
+    monkeypatch.setattr(server, "registry", registry)
+    monkeypatch.setattr(server, "response_cache", response_cache)
+    monkeypatch.setattr(server, "default_model", "a")
+    return TestClient(server.app)
+
+
+def test_reload_serves_published_results(client, tmp_path):
+    db_file = build_database("a", tmp_path)
+    assert client.get("/npv/noun/猫", params={"model": "a"}).json() == []
+
+    results_file = tmp_path / "ted_npvs_a.csv"
+    with open(results_file, "a", encoding="utf-8") as f:
+        f.write("猫,を,飼う,ted\n")
+    # Published a while after the database was built.
+    mtime = db_file.stat().st_mtime_ns + 10**9
+    os.utime(results_file, ns=(mtime, mtime))
+    assert server.registry.reload("a") == "reloaded"
+
+    rows = client.get("/npv/noun/猫", params={"model": "a"}).json()
+    assert [(row["p"], row["v"]) for row in rows] == [("を", "飼う")]
+
+
+def test_reload_endpoint(client, monkeypatch):
+    assert client.post("/admin/reload").status_code == 403
+    monkeypatch.setattr(server, "reload_token", "secret")
+    assert client.post("/admin/reload").status_code == 401
+
+    headers = {"Authorization": "Bearer secret"}
+    response = client.post("/admin/reload", params={"model": "c"}, headers=headers)
+    assert response.status_code == 404
+    response = client.post("/admin/reload", params={"model": "a"}, headers=headers)
+    assert response.json() == {"a": "not loaded"}
+    client.get("/corpus/norm", params={"model": "a"})
+    response = client.post("/admin/reload", params={"model": "a"}, headers=headers)
+    assert response.status_code == 202
+    assert response.json() == {"a": "reloading"}
+
+
+def test_response_cache(client, tmp_path):
+    params = {"model": "a"}
+    first = client.get("/npv/noun/本", params=params).json()
+    assert client.get("/npv/noun/本", params=params).json() == first
+    client.get("/npv/noun/本", params={"model": "a", "limit": 1})
+    stats = client.get("/cache/stats").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+    # A new snapshot version is never served from responses of the old one.
+    write_results(tmp_path, "ted", "a", TED_ROWS + [("本", "を", "貸す")])
+    assert server.registry.reload("a") == "reloaded"
+    assert client.get("/cache/stats").json()["entries"] == 0
+    rows = client.get("/npv/noun/本", params=params).json()
+    assert ("を", "貸す") in [(row["p"], row["v"]) for row in rows]
+    assert client.get("/cache/stats").json()["misses"] == 3
+
+
+@pytest.fixture
+def compressing(monkeypatch):
+    """Compress bodies of any size, as the fixture responses are small."""
+    monkeypatch.setattr(server, "COMPRESS_MIN_SIZE", 0)
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, encoding",
+    [
+        ("gzip", "gzip"),
+        ("identity", None),
+        ("gzip;q=0", None),
+        ("br;q=0, gzip;q=0.5", "gzip"),
+        ("*", "gzip"),
+        ("*, gzip;q=0", None),
+    ],
+)
+def test_content_encoding(client, compressing, monkeypatch, accept_encoding, encoding):
+    monkeypatch.setattr(server, "brotli", None)
+    expected = client.get(
+        "/npv/noun/本", params={"model": "a"}, headers={"Accept-Encoding": ""}
+    ).json()
+    response = client.get(
+        "/npv/noun/本",
+        params={"model": "a"},
+        headers={"Accept-Encoding": accept_encoding},
+    )
+    assert response.headers.get("Content-Encoding") == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.json() == expected
+
+
+def test_brotli_encoding(client, compressing):
+    if server.brotli is None:
+        pytest.skip("brotli is not installed")
+    expected = client.get(
+        "/npv/noun/本", params={"model": "a"}, headers={"Accept-Encoding": ""}
+    ).json()
+    headers = {"Accept-Encoding": "gzip, br"}
+    with client.stream(
+        "GET", "/npv/noun/本", params={"model": "a"}, headers=headers
+    ) as response:
+        assert response.headers["Content-Encoding"] == "br"
+        body = server.brotli.decompress(b"".join(response.iter_raw()))
+    assert json.loads(body) == expected
+    headers = {"Accept-Encoding": "gzip, br;q=0.5"}
+    response = client.get("/npv/noun/本", params={"model": "a"}, headers=headers)
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_arrow_stream(client):
+    expected = client.get("/npv/noun/本", params={"model": "a"}).json()
+    headers = {"Accept": server.ARROW_STREAM, "Accept-Encoding": "gzip"}
+    response = client.get("/npv/noun/本", params={"model": "a"}, headers=headers)
+    assert response.headers["Content-Type"] == server.ARROW_STREAM
+    assert pl.read_ipc_stream(response.content).to_dicts() == expected
+    # Search results are not frames and stay JSON.
+    response = client.get("/search/本", params={"model": "a"}, headers=headers)
+    assert response.headers["Content-Type"] == "application/json"
+
+
+def npv_rows(client, path, **params):
+    response = client.get(path, params={"model": "a", **params})
+    assert response.status_code == 200
+    return [tuple(row.values()) for row in response.json()]
+
+
+def test_row_selection(client):
+    # Ranked by frequency times corpus norm (ted 3/7, jnlp 1), then by p and v.
+    ranked = [
+        ("を", "読む", "jnlp", 2),
+        ("を", "読む", "ted", 3),
+        ("を", "引用する", "jnlp", 1),
+        ("に", "書く", "ted", 1),
+        ("を", "書く", "ted", 1),
+        ("を", "買う", "ted", 1),
+    ]
+    assert npv_rows(client, "/npv/noun/本", limit=10) == ranked
+    assert npv_rows(client, "/npv/noun/本", limit=2, offset=1) == ranked[1:3]
+    assert npv_rows(client, "/npv/noun/本", offset=4) == ranked[4:]
+    assert npv_rows(client, "/npv/noun/本", limit=3, offset=10) == []
+    assert npv_rows(client, "/npv/noun/本", limit=10, min_frequency=2) == ranked[:2]
+    assert npv_rows(client, "/npv/noun/本", particle="に") == [("に", "書く", "ted", 1)]
+    assert npv_rows(client, "/npv/noun/本", limit=2, corpus=["jnlp"]) == [
+        ranked[0],
+        ranked[2],
+    ]
+    assert npv_rows(
+        client, "/npv/verb/書く", limit=5, particle="を", corpus=["ted"]
+    ) == [("手紙", "を", "ted", 1), ("本", "を", "ted", 1)]
+
+
+def test_row_selection_cache_key(client):
+    for corpora in [["ted", "jnlp"], ["jnlp", "ted"]]:
+        npv_rows(client, "/npv/noun/本", limit=2, corpus=corpora)
+    stats = client.get("/cache/stats").json()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    "params", [{"limit": 0}, {"offset": -1}, {"min_frequency": 0}, {"limit": "x"}]
+)
+def test_row_selection_limits(client, params):
+    response = client.get("/npv/noun/本", params={"model": "a", **params})
+    assert response.status_code == 422
+
+
+def test_model_routing(client, tmp_path):
+    write_results(tmp_path, "ted", "b", TED_ROWS + [("猫", "を", "飼う")])
+    assert client.get("/models").json() == {"a": ["jnlp", "ted"], "b": ["jnlp", "ted"]}
+    assert npv_rows(client, "/npv/noun/猫") == []
+    assert npv_rows(client, "/npv/noun/猫", model="b") == [("を", "飼う", "ted", 1)]
+    for path in ["/npv/noun/本", "/npv/verb/読む", "/search/本", "/corpus/norm"]:
+        assert client.get(path, params={"model": "c"}).status_code == 404
+
+
+def test_snapshot_eviction(client, tmp_path):
+    for corpus, rows in [("ted", TED_ROWS), ("jnlp", JNLP_ROWS)]:
+        write_results(tmp_path, corpus, "c", rows)
+    client.get("/corpus/norm", params={"model": "a"})
+    size = server.registry.sizes["a"]
+    server.registry.memory_budget = 2 * size
+
+    # Reading "a" after "b" makes "b" the least recently used snapshot.
+    for model in ["b", "a", "c"]:
+        client.get("/corpus/norm", params={"model": model})
+    status = client.get("/admin/status").json()
+    assert status["loaded"] == {"a": size, "c": size}
+    assert status["memory_budget"] == 2 * size
+
+    # The most recently used snapshot is kept even beyond the budget.
+    server.registry.memory_budget = 1
+    assert npv_rows(client, "/npv/noun/本", model="b", limit=1)
+    assert list(client.get("/admin/status").json()["loaded"]) == ["b"]
+
+
+def test_mapped_snapshot_size(client, tmp_path):
+    build_database("a", tmp_path)
+    for model in ["a", "b"]:
+        client.get("/corpus/norm", params={"model": model})
+    a, b = server.registry.snapshots["a"], server.registry.snapshots["b"]
+    assert a.index.mapped and not b.index.mapped
+    # Memory-mapped tables do not count against the memory budget.
+    sizes = client.get("/admin/status").json()["loaded"]
+    assert sizes["a"] == a.search_index.estimated_size()
+    assert sizes["b"] == sizes["a"] + b.index.heap_size() > sizes["a"]